@@ -0,0 +1,157 @@
+# backend/answer_cache.py
+
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+TIER_EXACT = "exact"
+TIER_SEMANTIC = "semantic"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE.sub(" ", question).strip().strip("?!. ").lower()
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+
+class AnswerCache:
+    """Per-document answers with an exact tier on the normalized question and a cosine-similarity tier.
+
+    Entries live in one LRU shared by all documents; each also expires after ttl_seconds. When
+    index_version is set (document_id -> live index version), every entry records the version its
+    answer was generated from and is only served while that version is still live.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD, index_version: Optional[Callable[[int], Optional[str]]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version = index_version
+        self._entries = OrderedDict()
+        # document_id -> keys of its entries, so the semantic tier only scans one document's questions.
+        self._by_document = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "exact_misses": 0, "semantic_hits": 0, "semantic_misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    def set_index_version_source(self, index_version: Optional[Callable[[int], Optional[str]]]):
+        """Sets the document_id -> live index version lookup; entries cached before it was set are dropped."""
+        with self._lock:
+            self.index_version = index_version
+            self._entries.clear()
+            self._by_document.clear()
+
+    def _expired(self, entry) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _live_version(self, document_id: int) -> Optional[str]:
+        return self.index_version(document_id) if self.index_version is not None else None
+
+    def _usable_locked(self, key, entry, live_version: Optional[str]) -> bool:
+        # Drops entries that expired or were answered from an index version that has since been replaced.
+        if self._expired(entry):
+            self._remove_locked(key)
+            return False
+        if entry["index_version"] != live_version:
+            self._remove_locked(key)
+            self._stats["stale"] += 1
+            return False
+        return True
+
+    def _remove_locked(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_document.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_document[key[0]]
+
+    def get_exact(self, document_id: int, question: str) -> Optional[dict]:
+        key = (document_id, normalize_question(question))
+        live_version = self._live_version(document_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._usable_locked(key, entry, live_version):
+                self._stats["exact_misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["exact_hits"] += 1
+            return entry
+
+    def get_semantic(self, document_id: int, question_embedding: List[float]) -> Optional[dict]:
+        query = _unit(question_embedding)
+        best_key, best_score = None, self.similarity_threshold
+        live_version = self._live_version(document_id)
+        with self._lock:
+            for key in list(self._by_document.get(document_id, ())):
+                entry = self._entries[key]
+                if not self._usable_locked(key, entry, live_version):
+                    continue
+                if entry["embedding"] is None:
+                    continue
+                score = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self._stats["semantic_misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return dict(self._entries[best_key], similarity=best_score)
+
+    def put(self, document_id: int, question: str, answer: str, sources: List[dict], question_embedding: Optional[List[float]] = None, index_version: Optional[str] = None):
+        """Caches an answer generated from index_version, the version that was live when the question arrived."""
+        if self.max_entries <= 0:
+            return
+        key = (document_id, normalize_question(question))
+        entry = {
+            "answer": answer,
+            "sources": sources,
+            "embedding": _unit(question_embedding) if question_embedding is not None else None,
+            "index_version": index_version,
+            "created_at": time.time(),
+        }
+        live_version = self._live_version(document_id)
+        with self._lock:
+            if index_version != live_version:
+                # The document was re-indexed while this answer was being generated.
+                self._stats["stale"] += 1
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_document.setdefault(document_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate_document(self, document_id: int):
+        with self._lock:
+            stale = list(self._by_document.get(document_id, ()))
+            for key in stale:
+                self._remove_locked(key)
+            if stale:
+                self._stats["invalidations"] += len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+answer_cache = AnswerCache()
+
+
+def set_index_version_source(index_version: Callable[[int], Optional[str]]):
+    """Makes the shared cache version-aware; nlp_utils, which owns the index version pointers, calls this."""
+    answer_cache.set_index_version_source(index_version)
@@ -0,0 +1,207 @@
+# backend/benchmarks/cold_start_bench.py
+"""Worker cold-start benchmark: time to ``import main`` and time from process start to the first answer.
+
+Every measurement runs in a fresh interpreter against a document ingested once up front, with the local
+deterministic models, so no API key or network is needed. Run from ``backend/``:
+
+    python -m benchmarks.cold_start_bench --runs 5 --output cold.json
+
+Compare two runs with ``python -m benchmarks.cold_start_bench --compare before.json after.json``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_environment(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "MODEL_BACKEND": "local",
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_TOKEN_DELAY": "0",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "ANSWER_CACHE_MAX_ENTRIES": "0",
+        "EMBED_REQUESTS_PER_SECOND": "0",
+        "PYTHONPATH": BACKEND_DIR,
+    })
+    # Trees without the model backend registry still insist on a key at import time.
+    env.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+    return env
+
+
+def _use_local_embeddings(nlp_utils):
+    try:
+        import model_backends  # noqa: F401
+    except ImportError:
+        # Trees before the registry always build Gemini clients; swap in the deterministic stand-in.
+        import fake_models
+        stand_in = fake_models.DeterministicEmbeddings()
+        nlp_utils.embeddings = stand_in
+        nlp_utils.batched_embeddings.embeddings = stand_in
+        nlp_utils.query_embeddings.embeddings = stand_in
+
+
+def child_prepare(pages: int):
+    import logging
+
+    import database
+    import main
+    import models
+    import nlp_utils
+    from fastapi.testclient import TestClient
+
+    from benchmarks.ingest_query_bench import generate_pdf, wait_for_job
+
+    _use_local_embeddings(nlp_utils)
+    logging.getLogger().setLevel(logging.WARNING)
+    models.Base.metadata.create_all(bind=database.engine)
+    with TestClient(main.app) as client:
+        response = client.post("/upload-pdf/", files={"file": ("cold_start.pdf", generate_pdf(pages, seed=7), "application/pdf")})
+        response.raise_for_status()
+        job = wait_for_job(client, response.json()["job_id"])
+        if job["status"] != "ready":
+            raise RuntimeError(f"Ingest failed: {job['error']}")
+        # Gives warm-up something to preload in the measured runs.
+        client.post(f"/ask-question/{response.json()['id']}", json={"question": "warm-up history"}).raise_for_status()
+    print(json.dumps({"document_id": response.json()["id"]}))
+
+
+def child_import():
+    start = time.perf_counter()
+    import main  # noqa: F401
+    print(json.dumps({"import_seconds": time.perf_counter() - start}))
+
+
+def child_first_answer(document_id: int, wait_ready: bool):
+    import logging
+
+    start = time.perf_counter()
+    import main
+    import nlp_utils
+    import_seconds = time.perf_counter() - start
+    _use_local_embeddings(nlp_utils)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        startup_seconds = time.perf_counter() - start
+        ready_seconds = None
+        if wait_ready:
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.01)
+            ready_seconds = time.perf_counter() - start
+        question_start = time.perf_counter()
+        response = client.post(f"/ask-question/{document_id}", json={"question": "What does clause ID-7-3 say about payment?"})
+        response.raise_for_status()
+        first_answer_seconds = time.perf_counter() - start
+    print(json.dumps({
+        "import_seconds": import_seconds,
+        "startup_seconds": startup_seconds,
+        "ready_seconds": ready_seconds,
+        "first_question_seconds": time.perf_counter() - question_start,
+        "first_answer_seconds": first_answer_seconds,
+    }))
+
+
+def run_child(workdir: str, *args) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start_bench", "--child", *args],
+        cwd=workdir, env=child_environment(workdir), capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - started
+    return result
+
+
+def summarize(results, key):
+    values = [result[key] for result in results if result.get(key) is not None]
+    if not values:
+        return None
+    return {"mean": statistics.mean(values), "median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="askmypdf-cold-")
+    document_id = run_child(workdir, "prepare", str(args.pages))["document_id"]
+
+    imports = [run_child(workdir, "import") for _ in range(args.runs)]
+    first_answers = [run_child(workdir, "first-answer", str(document_id)) for _ in range(args.runs)]
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "import_seconds": summarize(imports, "import_seconds"),
+        "first_answer": {
+            key: summarize(first_answers, key)
+            for key in ("import_seconds", "startup_seconds", "first_question_seconds", "first_answer_seconds", "process_seconds")
+        },
+        "workdir": workdir,
+    }
+    if args.wait_ready:
+        ready_runs = [run_child(workdir, "first-answer", str(document_id), "--wait-ready") for _ in range(args.runs)]
+        results["first_answer_after_ready"] = {
+            key: summarize(ready_runs, key)
+            for key in ("startup_seconds", "ready_seconds", "first_question_seconds", "first_answer_seconds", "process_seconds")
+        }
+    return results
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{old:.4g}s -> {new:.4g}s ({(new - old) / old * 100:+.1f}%)" if old and new is not None else f"{old} -> {new}"
+
+    print(f"import main (median): {change(before['import_seconds']['median'], after['import_seconds']['median'])}")
+    for key, summary in after["first_answer"].items():
+        old = before["first_answer"].get(key)
+        if old and summary:
+            print(f"first answer {key} (median): {change(old['median'], summary['median'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement.")
+    parser.add_argument("--pages", type=int, default=20, help="Pages in the pre-ingested document.")
+    parser.add_argument("--wait-ready", action="store_true", help="Also measure first answers asked after /ready reports warm-up finished.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit.")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, *rest = args.child
+        if mode == "prepare":
+            child_prepare(int(rest[0]))
+        elif mode == "import":
+            child_import()
+        else:
+            child_first_answer(int(rest[0]), args.wait_ready)
+        sys.exit(0)
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    results = run(args)
+    payload = json.dumps(results, indent=2)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
@@ -0,0 +1,133 @@
+# backend/benchmarks/db_concurrency_bench.py
+"""Load test of the database-backed endpoints against a local SQLite (or any DATABASE_URL) stand-in.
+
+Fires concurrent GET /documents/ and POST /submit-feedback/ requests through an in-process ASGI client
+while probing GET / on the same event loop. If DB I/O blocked the loop, probe latency would grow with
+the number of in-flight DB requests; with async sessions it stays flat. Run from ``backend/``:
+
+    python -m benchmarks.db_concurrency_bench --concurrency 1 8 32 --requests 400
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def max_connections(engine) -> int:
+    # pool_size + max_overflow; pools without sizing (in-memory SQLite) report their single connection.
+    pool = engine.pool
+    if not hasattr(pool, "_max_overflow"):
+        return 1
+    return pool.size() + pool._max_overflow
+
+
+async def run_level(client, document_id: int, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    done = asyncio.Event()
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            if i % 2:
+                response = await client.get("/documents/")
+            else:
+                response = await client.post("/submit-feedback/", json={
+                    "document_id": document_id, "question": f"q{i}", "answer": "a", "feedback_type": "helpful"
+                })
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    probe_latencies = []
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/")
+            probe_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    done.set()
+    await probe_task
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / wall,
+        "latency_seconds": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99)},
+        "event_loop_probe_seconds": {"p50": percentile(probe_latencies, 0.5), "p95": percentile(probe_latencies, 0.95), "mean": statistics.mean(probe_latencies) if probe_latencies else None},
+    }
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="askmypdf-db-bench-")
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import httpx
+    import database
+    import main as app_module
+    import models
+
+    logging.getLogger().setLevel(logging.WARNING)
+    models.Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        document = models.Document(filename=f"bench-{time.time()}.pdf", status="ready")
+        db.add(document)
+        db.commit()
+        document_id = document.id
+
+    results = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, document_id, concurrency, args.requests)
+            results.append(result)
+            print(f"concurrency {concurrency:>3}: {result['throughput_rps']:.0f} req/s, p95 {result['latency_seconds']['p95']:.4f}s, "
+                  f"loop probe p95 {result['event_loop_probe_seconds']['p95']:.4f}s", file=sys.stderr)
+    connection_limits = {
+        "sync": max_connections(database.engine),
+        "async": max_connections(database.async_engine.sync_engine),
+    }
+    print(f"worst-case connections: sync {connection_limits['sync']}, async {connection_limits['async']}, "
+          f"total {connection_limits['sync'] + connection_limits['async']}", file=sys.stderr)
+    await database.async_engine.dispose()
+    return {"database_url": database.to_async_url(os.environ["DATABASE_URL"]), "connection_limits": connection_limits, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output) if args.output else None
+    payload = json.dumps(asyncio.run(main(args)), indent=2)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
@@ -0,0 +1,58 @@
+# backend/benchmarks/embedding_throughput.py
+"""Measures ingest embedding throughput (chunks/sec) of nlp_utils.BatchedEmbeddings against the stub server.
+
+Run from ``backend/``: ``python -m benchmarks.embedding_throughput --chunks 2000 --throttle-rate 0.05``
+"""
+
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import nlp_utils
+from benchmarks.stub_embedding_server import StubServerEmbeddings, start_server
+
+
+def run(chunks: int, batch_size: int, max_in_flight: int, requests_per_second: float, latency_ms: float, throttle_rate: float):
+    server = start_server(latency_ms=latency_ms, throttle_rate=throttle_rate)
+    try:
+        client = StubServerEmbeddings(f"http://127.0.0.1:{server.server_address[1]}/embed")
+        embedder = nlp_utils.BatchedEmbeddings(
+            client,
+            batch_size=batch_size,
+            max_in_flight=max_in_flight,
+            requests_per_second=requests_per_second,
+            retry_base_delay=0.05,
+        )
+        texts = [f"Synthetic chunk {i} " + "lorem ipsum dolor sit amet " * 30 for i in range(chunks)]
+        start = time.perf_counter()
+        vectors = embedder.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        assert len(vectors) == chunks
+        return {
+            "chunks": chunks,
+            "batch_size": batch_size,
+            "max_in_flight": max_in_flight,
+            "requests_per_second": requests_per_second,
+            "latency_ms": latency_ms,
+            "throttle_rate": throttle_rate,
+            "elapsed_seconds": elapsed,
+            "chunks_per_second": chunks / elapsed if elapsed else None,
+            "embedder": embedder.stats(),
+        }
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=nlp_utils.EMBED_BATCH_SIZE)
+    parser.add_argument("--max-in-flight", type=int, default=nlp_utils.EMBED_MAX_IN_FLIGHT)
+    parser.add_argument("--requests-per-second", type=float, default=nlp_utils.EMBED_REQUESTS_PER_SECOND)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.chunks, args.batch_size, args.max_in_flight, args.requests_per_second, args.latency_ms, args.throttle_rate), indent=2))
@@ -0,0 +1,307 @@
+# backend/benchmarks/ingest_query_bench.py
+"""Offline benchmark of the upload and question hot paths, driven through FastAPI's TestClient.
+
+Gemini is replaced with deterministic stand-ins (fake_models), PDFs are generated locally, and all
+artifacts live in a temporary working directory. Run from ``backend/``:
+
+    python -m benchmarks.ingest_query_bench --pages 1 10 100 1000 2000 --output bench.json
+
+Compare two runs with ``python -m benchmarks.ingest_query_bench --compare before.json after.json``.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = ("contract party clause amendment payment term notice liability warranty schedule delivery "
+         "invoice section agreement obligation termination confidential renewal audit").split()
+
+
+class PeakRSSSampler:
+    """Samples resident set size from /proc so each scenario gets its own peak.
+
+    peak_kb covers this process and its descendants (the PDF extraction worker pool); peak_self_kb
+    is this process alone.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_kb = 0
+        self.peak_self_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def process_kb(pid) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    @staticmethod
+    def child_pids(pid) -> list:
+        children = []
+        for path in glob.glob(f"/proc/{pid}/task/*/children"):
+            try:
+                with open(path) as f:
+                    children.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+        return children
+
+    @classmethod
+    def current_kb(cls):
+        """Returns (RSS of this process and all its descendants, RSS of this process) in KiB."""
+        own = cls.process_kb(os.getpid())
+        if not own:
+            # No /proc: fall back to getrusage peaks, which include only children that have exited.
+            own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return own + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss, own
+        total = own
+        pending = cls.child_pids(os.getpid())
+        seen = set()
+        while pending:
+            pid = pending.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            total += cls.process_kb(pid)
+            pending.extend(cls.child_pids(pid))
+        return total, own
+
+    def _sample(self):
+        total, own = self.current_kb()
+        self.peak_kb = max(self.peak_kb, total)
+        self.peak_self_kb = max(self.peak_self_kb, own)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def generate_pdf(page_count: int, seed: int) -> bytes:
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(1, page_count + 1):
+        page = doc.new_page()
+        words = [rng.choice(WORDS) for _ in range(420)]
+        body = f"Section {seed}.{page_number} clause ID-{seed}-{page_number}. " + " ".join(words)
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), body, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def setup_app(workdir: str, embedding_latency: float, llm_token_delay: float):
+    os.environ["GOOGLE_API_KEY"] = os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_TOKEN_DELAY"] = str(llm_token_delay)
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    os.environ["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+    os.environ.setdefault("EMBED_REQUESTS_PER_SECOND", "0")
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import database
+    import fake_models
+    import main
+    import models
+    import nlp_utils
+
+    stand_in = fake_models.DeterministicEmbeddings(latency=embedding_latency)
+    nlp_utils.embeddings = stand_in
+    nlp_utils.batched_embeddings.embeddings = stand_in
+    nlp_utils.query_embeddings.embeddings = stand_in
+    models.Base.metadata.create_all(bind=database.engine)
+    # Per-request INFO logging would dominate the measurements and the console.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)
+
+
+def wait_for_job(client, job_id: str, timeout: float = 3600.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("ready", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def bench_ingest(client, page_count: int, seed: int) -> dict:
+    pdf = generate_pdf(page_count, seed)
+    with PeakRSSSampler() as rss:
+        start = time.perf_counter()
+        response = client.post("/upload-pdf/", files={"file": (f"bench_{seed}_{page_count}.pdf", pdf, "application/pdf")})
+        response.raise_for_status()
+        upload_seconds = time.perf_counter() - start
+        job = wait_for_job(client, response.json()["job_id"])
+        total_seconds = time.perf_counter() - start
+    if job["status"] != "ready":
+        raise RuntimeError(f"Ingest of {page_count} pages failed: {job['error']}")
+
+    timings = job["timings"]
+    chunks = job.get("chunks") or 0
+    return {
+        "document_id": response.json()["id"],
+        "pages": page_count,
+        "pdf_bytes": len(pdf),
+        "chunks": chunks,
+        "upload_response_seconds": upload_seconds,
+        "total_seconds": total_seconds,
+        "timings": timings,
+        "pages_per_second_extracted": page_count / timings["extracting"] if timings.get("extracting") else None,
+        "chunks_per_second_embedded": chunks / timings["embedding"] if timings.get("embedding") else None,
+        "persist_seconds": timings.get("persisting"),
+        "peak_rss_mb": rss.peak_kb / 1024.0,
+        "peak_rss_self_mb": rss.peak_self_kb / 1024.0,
+    }
+
+
+def bench_queries(client, document_id: int, concurrency: int, queries: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    questions = [f"What does clause ID-{seed}-{rng.randint(1, 50)} say about {rng.choice(WORDS)} ({i})?" for i in range(queries)]
+
+    def ask(question):
+        start = time.perf_counter()
+        response = client.post(f"/ask-question/{document_id}", json={"question": question})
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code
+
+    with PeakRSSSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(ask, questions))
+        wall_seconds = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, status in results if status == 200]
+    return {
+        "document_id": document_id,
+        "concurrency": concurrency,
+        "queries": queries,
+        "errors": sum(1 for _, status in results if status != 200),
+        "throughput_qps": queries / wall_seconds if wall_seconds else None,
+        "latency_seconds": {
+            "mean": statistics.mean(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+        },
+        "peak_rss_mb": rss.peak_kb / 1024.0,
+        "peak_rss_self_mb": rss.peak_self_kb / 1024.0,
+    }
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="askmypdf-bench-")
+    client = setup_app(workdir, args.embedding_latency, args.llm_token_delay)
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "ingest": [],
+        "query": [],
+    }
+    for seed, page_count in enumerate(args.pages, start=1):
+        result = bench_ingest(client, page_count, seed)
+        results["ingest"].append(result)
+        print(f"ingest {page_count:>5} pages: {result['total_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB "
+              f"({result['peak_rss_self_mb']:.0f} MB in the server process)", file=sys.stderr)
+
+    query_document = max(results["ingest"], key=lambda r: r["pages"] if r["pages"] <= args.query_document_pages else -1)
+    for concurrency in args.concurrency:
+        result = bench_queries(client, query_document["document_id"], concurrency, args.queries, seed=concurrency)
+        results["query"].append(result)
+        print(f"query concurrency {concurrency:>3}: p50 {result['latency_seconds']['p50']:.4f}s p95 {result['latency_seconds']['p95']:.4f}s", file=sys.stderr)
+    results["workdir"] = workdir
+    return results
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{old:.4g} -> {new:.4g} ({(new - old) / old * 100:+.1f}%)" if old and new is not None else f"{old} -> {new}"
+
+    before_ingest = {r["pages"]: r for r in before["ingest"]}
+    for result in after["ingest"]:
+        old = before_ingest.get(result["pages"])
+        if old:
+            print(f"ingest {result['pages']:>5} pages: total {change(old['total_seconds'], result['total_seconds'])}, "
+                  f"peak RSS MB {change(old['peak_rss_mb'], result['peak_rss_mb'])}")
+    before_query = {r["concurrency"]: r for r in before["query"]}
+    for result in after["query"]:
+        old = before_query.get(result["concurrency"])
+        if old:
+            print(f"query concurrency {result['concurrency']:>3}: p95 {change(old['latency_seconds']['p95'], result['latency_seconds']['p95'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500, 2000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=200, help="Questions per concurrency level.")
+    parser.add_argument("--query-document-pages", type=int, default=100, help="Largest ingested document size to query against.")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Simulated seconds per embedding call.")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0, help="Simulated seconds per generated token.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    results = run(args)
+    payload = json.dumps(results, indent=2)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
@@ -0,0 +1,38 @@
+# backend/benchmarks/metrics_overhead.py
+"""Measures the per-call cost of metrics.span, enabled and disabled. Run from ``backend/``:
+
+    python -m benchmarks.metrics_overhead
+"""
+
+import json
+import time
+import timeit
+
+import metrics
+
+
+def run(iterations: int = 200000) -> dict:
+    def instrumented():
+        with metrics.span("overhead_probe"):
+            pass
+
+    def bare():
+        pass
+
+    results = {}
+    for enabled in (True, False):
+        metrics.METRICS_ENABLED = enabled
+        seconds = min(timeit.repeat(instrumented, number=iterations, repeat=5, timer=time.perf_counter))
+        results["enabled" if enabled else "disabled"] = seconds / iterations * 1e9
+    metrics.METRICS_ENABLED = True
+    baseline = min(timeit.repeat(bare, number=iterations, repeat=5, timer=time.perf_counter)) / iterations * 1e9
+    return {
+        "iterations": iterations,
+        "span_ns_enabled": results["enabled"] - baseline,
+        "span_ns_disabled": results["disabled"] - baseline,
+        "render_ms": timeit.timeit(metrics.render_prometheus, number=100) / 100 * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,95 @@
+# backend/benchmarks/stub_embedding_server.py
+"""Local stand-in for the embedding provider with injectable latency and 429 responses.
+
+Run with ``python -m benchmarks.stub_embedding_server --latency-ms 80 --throttle-rate 0.1`` from ``backend/``.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_DIMENSIONS = 768
+
+
+def deterministic_vector(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> List[float]:
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+
+
+def make_handler(latency_ms: float, throttle_rate: float, dimensions: int):
+    class StubEmbeddingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if random.random() < throttle_rate:
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.end_headers()
+                return
+            time.sleep(latency_ms / 1000.0)
+            body = json.dumps({"embeddings": [deterministic_vector(t, dimensions) for t in payload.get("texts", [])]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubEmbeddingHandler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 50.0, throttle_rate: float = 0.0, dimensions: int = DEFAULT_DIMENSIONS):
+    server = ThreadingHTTPServer((host, port), make_handler(latency_ms, throttle_rate, dimensions))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class StubServerEmbeddings(Embeddings):
+    """Embeddings client for the stub server; throttled requests raise urllib's HTTPError with code 429."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"texts": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    args = parser.parse_args()
+    server = start_server(args.host, args.port, args.latency_ms, args.throttle_rate, args.dimensions)
+    print(f"Stub embedding server listening on http://{args.host}:{server.server_address[1]}/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,177 @@
+# backend/context_assembly.py
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+CONTEXT_ASSEMBLY_ENABLED = os.getenv("CONTEXT_ASSEMBLY_ENABLED", "true").lower() not in ("0", "false", "no")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_NEAR_DUPLICATE_THRESHOLD", "0.85"))
+
+# Token counts are estimated locally; Gemini averages roughly four characters per token on English text.
+CHARS_PER_TOKEN = 4
+# Chunks without a start_index (indexed before offsets were recorded) are merged by matching text instead;
+# the splitter never overlaps more than its chunk_overlap, so only that much suffix/prefix is compared.
+MAX_TEXT_OVERLAP = 200
+MIN_TEXT_OVERLAP = 20
+# The splitter strips whitespace at chunk edges, so "adjacent" chunks can be a couple of characters apart.
+ADJACENT_GAP = 2
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def context_tokens(documents: List[Document]) -> int:
+    """Estimated size of the "stuff" chain context, which joins page contents with blank lines."""
+    return estimate_tokens("\n\n".join(doc.page_content for doc in documents))
+
+
+class _Block:
+    def __init__(self, doc: Document, rank: int):
+        self.text = doc.page_content
+        self.metadata = dict(doc.metadata)
+        self.rank = rank
+        start = doc.metadata.get("start_index")
+        self.start: Optional[int] = start if isinstance(start, int) and start >= 0 else None
+
+    @property
+    def end(self) -> Optional[int]:
+        return self.start + len(self.text) if self.start is not None else None
+
+    def absorb(self, other: "_Block", text: str, start: Optional[int]):
+        self.text = text
+        self.start = start
+        if other.rank < self.rank:
+            self.rank = other.rank
+            self.metadata = dict(other.metadata, start_index=start) if start is not None else dict(other.metadata)
+        elif start is not None:
+            self.metadata["start_index"] = start
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    for size in range(min(MAX_TEXT_OVERLAP, len(left), len(right)), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_by_offset(blocks: List[_Block]) -> List[_Block]:
+    merged: List[_Block] = []
+    for block in sorted(blocks, key=lambda b: b.start):
+        previous = merged[-1] if merged else None
+        if previous is None or block.start > previous.end + ADJACENT_GAP:
+            merged.append(block)
+            continue
+        if block.end <= previous.end:
+            previous.absorb(block, previous.text, previous.start)
+        elif block.start >= previous.end:
+            previous.absorb(block, previous.text + " " + block.text, previous.start)
+        else:
+            previous.absorb(block, previous.text + block.text[previous.end - block.start:], previous.start)
+    return merged
+
+
+def _merge_by_text(blocks: List[_Block]) -> List[_Block]:
+    blocks = list(blocks)
+    merged_any = True
+    while merged_any:
+        merged_any = False
+        for left in blocks:
+            for right in blocks:
+                if left is right:
+                    continue
+                if right.text in left.text:
+                    overlap = len(right.text)
+                    text = left.text
+                else:
+                    overlap = _text_overlap(left.text, right.text)
+                    text = left.text + right.text[overlap:]
+                if overlap >= MIN_TEXT_OVERLAP:
+                    start = left.start if left.start is not None and right.start is not None else None
+                    left.absorb(right, text, start)
+                    blocks.remove(right)
+                    merged_any = True
+                    break
+            if merged_any:
+                break
+    return blocks
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _drop_near_duplicates(blocks: List[_Block], threshold: float) -> List[_Block]:
+    # Containment rather than Jaccard, so a short chunk repeated inside a longer one is also dropped.
+    kept: List[Tuple[_Block, set]] = []
+    for block in sorted(blocks, key=lambda b: b.rank):
+        shingles = _shingles(block.text)
+        duplicate = any(
+            shingles and other and len(shingles & other) / min(len(shingles), len(other)) >= threshold
+            for _, other in kept
+        )
+        if not duplicate:
+            kept.append((block, shingles))
+    return [block for block, _ in kept]
+
+
+def _pack(blocks: List[_Block], token_budget: int) -> List[_Block]:
+    if token_budget <= 0:
+        return blocks
+    packed = []
+    used = 0
+    for block in blocks:
+        # Each block after the first also costs the blank-line separator.
+        cost = estimate_tokens(block.text) + (1 if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(block)
+            used += cost
+    if not packed and blocks:
+        best = blocks[0]
+        best.text = best.text[:token_budget * CHARS_PER_TOKEN]
+        packed.append(best)
+    return packed
+
+
+def assemble_context(
+    documents: List[Document],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    near_duplicate_threshold: float = CONTEXT_NEAR_DUPLICATE_THRESHOLD
+) -> Tuple[List[Document], Dict[str, int]]:
+    """Turns retrieved chunks (best first) into the documents placed in the prompt.
+
+    Overlapping or adjacent chunks of the same page are merged (by start_index, or by matching text for
+    chunks without offsets), near-duplicates are dropped and the rest is packed best-first under
+    token_budget. Returns the documents and the context size before and after.
+    """
+    groups: Dict[tuple, List[_Block]] = {}
+    for rank, doc in enumerate(documents):
+        key = (doc.metadata.get("document_id"), doc.metadata.get("page"))
+        groups.setdefault(key, []).append(_Block(doc, rank))
+
+    blocks: List[_Block] = []
+    for group in groups.values():
+        with_offsets = [block for block in group if block.start is not None]
+        without_offsets = [block for block in group if block.start is None]
+        blocks.extend(_merge_by_text(_merge_by_offset(with_offsets) + without_offsets))
+
+    blocks = _drop_near_duplicates(blocks, near_duplicate_threshold)
+    blocks = _pack(blocks, token_budget)
+    assembled = [Document(page_content=block.text, metadata=block.metadata) for block in blocks]
+    stats = {
+        "chunks_before": len(documents),
+        "chunks_after": len(assembled),
+        "tokens_before": context_tokens(documents),
+        "tokens_after": context_tokens(assembled),
+    }
+    return assembled, stats
@@ -0,0 +1,215 @@
+# backend/embedding_cache.py
+
+import hashlib
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "backend/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# SQLite caps the number of bound parameters per statement, so lookups are done in slices.
+_LOOKUP_BATCH = 500
+# Least recently used rows are fetched and deleted this many at a time when the cache is over budget.
+_EVICT_BATCH = 1000
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """Persistent (model, sha256(text)) -> vector table with least-recently-used eviction by size."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # Kept up to date by put_many and eviction, so writes never have to scan the table.
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        if not vectors:
+            return
+        now = time.time()
+        rows = [(model, h, array("f", v).tobytes(), now) for h, v in vectors.items()]
+        with self._lock:
+            hashes = list(vectors)
+            replaced_bytes = 0
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                replaced_bytes += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self.total_bytes += sum(len(row[2]) for row in rows) - replaced_bytes
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Trim to 90% of the budget so eviction does not run on every insert once the cache is full.
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self.total_bytes > target:
+            candidates = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not candidates:
+                self.total_bytes = 0
+                break
+            doomed = []
+            for rowid, size in candidates:
+                if self.total_bytes <= target:
+                    break
+                doomed.append((rowid,))
+                self.total_bytes -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+            evicted += len(doomed)
+        self._conn.commit()
+        logging.info(f"Embedding cache evicted {evicted} entries; {self.total_bytes} bytes remain.")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> EmbeddingCacheStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmbeddingCacheStore()
+        return _store
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings client so only texts missing from the cache are sent to the provider."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, store: EmbeddingCacheStore = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.store = store or get_store()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        cached = self.store.get_many(self.model_name, list(dict.fromkeys(hashes)))
+
+        # Identical chunks within the same call are only embedded once.
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.store.put_many(self.model_name, computed)
+            cached.update(computed)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "embedding_calls_saved": self.hits}
+
+
+class MemoizedQueryEmbeddings(Embeddings):
+    """Keeps recent query embeddings in memory so one question is embedded once per request path."""
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 1024):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, text: str, vector: List[float]):
+        with self._lock:
+            self._memo[text] = vector
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        # Gemini embeds queries and documents differently; its batch call accepts the query task type.
+        # Lazily created clients (model_backends.LazyEmbeddings) expose the real one as "wrapped".
+        client = getattr(self.embeddings, "wrapped", self.embeddings)
+        if "task_type" in inspect.signature(client.embed_documents).parameters:
+            return client.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+        return [client.embed_query(text) for text in texts]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Like embed_query for several questions, embedding the ones not memoized in a single batched call."""
+        with self._lock:
+            vectors = {text: self._memo[text] for text in texts if text in self._memo}
+            for text in vectors:
+                self._memo.move_to_end(text)
+        missing = list(dict.fromkeys(text for text in texts if text not in vectors))
+        if missing:
+            for text, vector in zip(missing, self._embed_query_batch(missing)):
+                vectors[text] = vector
+                self._remember(text, vector)
+        return [vectors[text] for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            vector = self._memo.get(text)
+            if vector is not None:
+                self._memo.move_to_end(text)
+                return vector
+        vector = self.embeddings.embed_query(text)
+        self._remember(text, vector)
+        return vector
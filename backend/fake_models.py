@@ -0,0 +1,66 @@
+# backend/fake_models.py
+"""Deterministic offline stand-ins for the Gemini models, used with LLM_PROVIDER=fake and by the benchmarks."""
+
+import hashlib
+import math
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+
+class FakeStreamingChatModel(FakeListChatModel):
+    """Cycles through canned responses, streaming them word by word with an optional per-token delay."""
+
+    token_delay: float = 0.0
+    first_token_delay: float = 0.0
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        response = self.responses[self.i]
+        self.i = (self.i + 1) % len(self.responses)
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+        words = response.split(" ")
+        for index, word in enumerate(words):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            token = word if index == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class DeterministicEmbeddings(Embeddings):
+    """Unit vectors seeded from the SHA-256 of the text, with an optional simulated per-call latency."""
+
+    def __init__(self, dimensions: int = 256, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._vector(text)
@@ -0,0 +1,257 @@
+# backend/ingestion.py
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from langchain_core.documents import Document
+
+import database
+import metrics
+import models
+import nlp_utils
+import page_store
+import pdf_extract
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+# Finished jobs stay pollable through /jobs/{job_id} for this long, and at most JOB_HISTORY_SIZE are kept.
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "1000"))
+
+STATUS_QUEUED = "queued"
+STATUS_EXTRACTING = "extracting"
+STATUS_EMBEDDING = "embedding"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# Bounds queued + running jobs so a burst of uploads is rejected instead of piling up unbounded.
+_slots = threading.BoundedSemaphore(INGEST_QUEUE_SIZE)
+_jobs = {}
+# document_id -> job_id of its queued or running ingestion job
+_active_jobs = {}
+_jobs_lock = threading.Lock()
+
+ingest_jobs_total = metrics.counter("askmypdf_ingest_jobs_total", "Finished ingestion jobs by outcome.", label_names=("status",))
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class DocumentBusy(Exception):
+    pass
+
+
+def get_job(job_id: str):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job, timings=dict(job["timings"]), embedding_cache=dict(job["embedding_cache"])) if job else None
+
+
+def get_active_job_id(document_id: int):
+    with _jobs_lock:
+        return _active_jobs.get(document_id)
+
+
+def reserve_document(document_id: int) -> str:
+    """Claims document_id for one ingestion job and returns that job's id; raises DocumentBusy if it is taken.
+
+    The reservation must be handed to submit_job or given back with release_document.
+    """
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        if document_id in _active_jobs:
+            raise DocumentBusy(f"Document ID {document_id} is still being processed.")
+        _active_jobs[document_id] = job_id
+    return job_id
+
+
+def release_document(document_id: int, job_id: str):
+    with _jobs_lock:
+        if _active_jobs.get(document_id) == job_id:
+            del _active_jobs[document_id]
+
+
+def _prune_jobs_locked(now: float):
+    # Oldest finished jobs first; queued and running jobs are never dropped.
+    finished = sorted((job["finished_at"], job_id) for job_id, job in _jobs.items() if job["finished_at"] is not None)
+    excess = len(_jobs) - JOB_HISTORY_SIZE
+    for finished_at, job_id in finished:
+        if excess <= 0 and now - finished_at <= JOB_RETENTION_SECONDS:
+            break
+        del _jobs[job_id]
+        excess -= 1
+
+
+def recover_interrupted_documents():
+    """Resolves documents a restart left mid-ingestion: ones with a published index become ready again, the rest failed."""
+    db = database.SessionLocal()
+    try:
+        interrupted = db.query(models.Document).filter(models.Document.status.notin_((STATUS_READY, STATUS_FAILED))).all()
+        for document in interrupted:
+            if get_active_job_id(document.id):
+                continue
+            status = STATUS_READY if nlp_utils.document_has_vectors(document.id) else STATUS_FAILED
+            logging.warning(f"Document ID {document.id} was left '{document.status}' by an interrupted ingestion; marking it {status}.")
+            document.status = status
+        db.commit()
+    finally:
+        db.close()
+
+
+def _update_job(job_id: str, **fields):
+    with _jobs_lock:
+        _jobs[job_id].update(fields)
+
+
+def _record_timing(job_id: str, stage: str, seconds: float):
+    with _jobs_lock:
+        _jobs[job_id]["timings"][stage] = round(seconds, 4)
+
+
+def _set_status(job_id: str, document_id: int, status: str, update_document: bool = True, **document_fields):
+    # The document row is written first, so a client that sees the job finish also sees the document's final state.
+    try:
+        if update_document:
+            db = database.SessionLocal()
+            try:
+                db.query(models.Document).filter(models.Document.id == document_id).update({"status": status, **document_fields})
+                db.commit()
+            finally:
+                db.close()
+    finally:
+        _update_job(job_id, status=status)
+
+
+class StagedExtraction:
+    """The text file and page store written during extraction, published only together with the new index."""
+
+    def __init__(self, document_id: int, text_file_path: str):
+        self.text_file_path = text_file_path
+        self.temporary_path = f"{text_file_path}.{uuid.uuid4().hex}.tmp"
+        self.pages = page_store.PageStoreWriter(document_id)
+
+    def publish(self):
+        self.pages.commit()
+        os.replace(self.temporary_path, self.text_file_path)
+
+    def discard(self):
+        self.pages.discard()
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+
+
+def extract_pdf(file_path: str, staged: StagedExtraction) -> Iterator[Document]:
+    """Streams one Document per page while writing the staged text file and page store."""
+    with open(staged.temporary_path, "w", encoding="utf-8") as text_file:
+        for page_number, page_text in pdf_extract.iter_pdf_pages(file_path):
+            text_file.write(f"\n--- Page {page_number} ---\n" + page_text)
+            staged.pages.add_page(page_number, page_text)
+            yield Document(page_content=page_text, metadata={"page": page_number})
+    staged.pages.finish()
+
+
+def _timed_extraction(job_id: str, document_id: int, pages: Iterator[Document], update_document: bool = True) -> Iterator[Document]:
+    # Extraction and embedding are interleaved, so only time spent producing pages counts as extraction.
+    elapsed = 0.0
+    page_count = 0
+    while True:
+        stage_start = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - stage_start
+        if page_count == 0:
+            _set_status(job_id, document_id, STATUS_EMBEDDING, update_document)
+        page_count += 1
+        yield page
+    _record_timing(job_id, STATUS_EXTRACTING, elapsed)
+    metrics.observe_stage("extract", elapsed)
+    logging.info(f"Job {job_id}: extracted {page_count} pages for document ID {document_id}")
+
+
+def _run_job(job_id: str, document_id: int, file_path: str, text_file_path: str, replace_existing: bool, content_hash: str, size_bytes: int):
+    started = time.perf_counter()
+    # A re-index is built beside the live index, so a document that is already queryable stays "ready" meanwhile.
+    serving_previous = False
+    staged = None
+    try:
+        _update_job(job_id, started_at=time.time())
+        staged = StagedExtraction(document_id, text_file_path)
+        serving_previous = replace_existing and nlp_utils.document_has_vectors(document_id)
+
+        _set_status(job_id, document_id, STATUS_EXTRACTING, not serving_previous)
+        stage_start = time.perf_counter()
+        pages = _timed_extraction(job_id, document_id, extract_pdf(file_path, staged), not serving_previous)
+        _, ingest_stats = nlp_utils.process_documents_and_create_vector_store(pages, document_id, reuse_previous=replace_existing, on_swap=staged.publish)
+        _update_job(job_id, embedding_cache=ingest_stats["embedding_cache"], pages=ingest_stats["pages"], chunks=ingest_stats["chunks"], reused_pages=ingest_stats["reused_pages"])
+        pipeline_elapsed = time.perf_counter() - stage_start
+        with _jobs_lock:
+            extraction_elapsed = _jobs[job_id]["timings"].get(STATUS_EXTRACTING, 0.0)
+        _record_timing(job_id, STATUS_EMBEDDING, pipeline_elapsed - extraction_elapsed - ingest_stats["persist_seconds"])
+        _record_timing(job_id, "persisting", ingest_stats["persist_seconds"])
+
+        # The hash only describes the document once its index holds this content; deduplication relies on that.
+        _set_status(job_id, document_id, STATUS_READY, content_hash=content_hash, size_bytes=size_bytes)
+        ingest_jobs_total.inc(status=STATUS_READY)
+        logging.info(f"Job {job_id}: document ID {document_id} is ready")
+    except Exception as e:
+        logging.error(f"Job {job_id}: ingestion failed for document ID {document_id}: {e}", exc_info=True)
+        _update_job(job_id, error=str(e))
+        ingest_jobs_total.inc(status=STATUS_FAILED)
+        if serving_previous:
+            logging.info(f"Job {job_id}: document ID {document_id} keeps serving its previous index")
+        try:
+            _set_status(job_id, document_id, STATUS_FAILED, not serving_previous)
+        except Exception as e_status:
+            logging.error(f"Job {job_id}: could not record failed status: {e_status}")
+    finally:
+        if staged is not None:
+            staged.discard()
+        release_document(document_id, job_id)
+        _record_timing(job_id, "total", time.perf_counter() - started)
+        _update_job(job_id, finished_at=time.time())
+        _slots.release()
+
+
+def acquire_slot():
+    if not _slots.acquire(blocking=False):
+        raise IngestionQueueFull(f"Ingestion queue is full ({INGEST_QUEUE_SIZE} jobs pending). Please retry shortly.")
+
+
+def release_slot():
+    _slots.release()
+
+
+def submit_job(job_id: str, document_id: int, file_path: str, text_file_path: str, content_hash: str, size_bytes: int, replace_existing: bool = False) -> str:
+    # The caller must hold a slot from acquire_slot() and the reservation job_id from reserve_document();
+    # both are released when the job finishes.
+    with _jobs_lock:
+        if _active_jobs.get(document_id) != job_id:
+            raise RuntimeError(f"Job {job_id} does not hold the reservation for document ID {document_id}.")
+        _prune_jobs_locked(time.time())
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "document_id": document_id,
+            "status": STATUS_QUEUED,
+            "error": None,
+            "timings": {},
+            "embedding_cache": {},
+            "pages": None,
+            "chunks": None,
+            "reused_pages": None,
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+    _executor.submit(_run_job, job_id, document_id, file_path, text_file_path, replace_existing, content_hash, size_bytes)
+    logging.info(f"Queued ingestion job {job_id} for document ID {document_id}")
+    return job_id
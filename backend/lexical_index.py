@@ -0,0 +1,170 @@
+# backend/lexical_index.py
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import uuid
+from array import array
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+LEXICAL_INDEX_DIR = "backend/lexical_index"
+os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps identifiers such as "ID-42", "4.2.1" or "part_no" together as one token; their parts are indexed too.
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_PATTERN.findall(token))
+    return tokens
+
+
+def index_path(document_id: int) -> str:
+    return os.path.join(LEXICAL_INDEX_DIR, f"document_{document_id}.bm25")
+
+
+# File layout: chunk records back to back (UTF-8 text followed by its metadata as JSON), the chunk table,
+# the postings, the term directory as JSON ({term: [postings position, chunk count]}), then the footer.
+# The chunk table holds chunk_count + 1 uint64 record offsets, then chunk_count uint32 text byte
+# lengths and chunk_count uint32 token counts. A term's postings are its chunk ids then its term
+# frequencies, each as count uint32 values. All integers are little-endian.
+_MAGIC = b"AMPBM25\x01"
+_FOOTER = struct.Struct("<QQQQd8s")  # chunk table position, chunk count, postings position, term directory position, average length, magic
+
+
+class BM25IndexWriter:
+    """Streams chunk records to a temporary file while building the postings; save() writes the index to path.
+
+    Only the postings and per-chunk offsets are held in memory, never the chunk texts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self.temporary_path, "wb")
+        self._offsets = array("Q", [0])
+        self._text_lengths = array("I")
+        self._lengths = array("I")
+        # term -> (chunk ids, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+    def add(self, text: str, metadata: dict):
+        chunk_id = len(self._lengths)
+        tokens = tokenize(text)
+        encoded = text.encode("utf-8")
+        self._file.write(encoded)
+        self._file.write(json.dumps(metadata, separators=(",", ":")).encode("utf-8"))
+        self._offsets.append(self._file.tell())
+        self._text_lengths.append(len(encoded))
+        self._lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            chunk_ids, tfs = self._postings.setdefault(term, (array("I"), array("I")))
+            chunk_ids.append(chunk_id)
+            tfs.append(tf)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def save(self):
+        chunk_count = len(self._lengths)
+        table_position = self._file.tell()
+        self._file.write(_pack("Q", self._offsets))
+        self._file.write(_pack("I", self._text_lengths))
+        self._file.write(_pack("I", self._lengths))
+        postings_position = self._file.tell()
+        directory = {}
+        for term, (chunk_ids, tfs) in self._postings.items():
+            directory[term] = [self._file.tell(), len(chunk_ids)]
+            self._file.write(_pack("I", chunk_ids))
+            self._file.write(_pack("I", tfs))
+        directory_position = self._file.tell()
+        self._file.write(json.dumps(directory, separators=(",", ":")).encode("utf-8"))
+        average_length = sum(self._lengths) / chunk_count if chunk_count else 0.0
+        self._file.write(_FOOTER.pack(table_position, chunk_count, postings_position, directory_position, average_length, _MAGIC))
+        self._file.close()
+        os.replace(self.temporary_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+
+
+def _pack(code: str, values) -> bytes:
+    return struct.pack(f"<{len(values)}{code}", *values)
+
+
+class BM25Index:
+    """Read-only, memory-mapped BM25 index over a document's chunks.
+
+    Opening reads only the footer, the per-chunk token counts and the term directory; postings and
+    chunk texts are read from the mapping when a query needs them.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer_position = len(self._mmap) - _FOOTER.size
+        table_position, self.chunk_count, _, directory_position, self.average_length, magic = _FOOTER.unpack_from(self._mmap, footer_position)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a BM25 index.")
+        self._offsets_position = table_position
+        self._text_lengths_position = table_position + (self.chunk_count + 1) * 8
+        self.lengths = struct.unpack_from(f"<{self.chunk_count}I", self._mmap, self._text_lengths_position + self.chunk_count * 4)
+        self._directory = json.loads(self._mmap[directory_position:footer_position].decode("utf-8"))
+
+    def __len__(self):
+        return self.chunk_count
+
+    def _posting(self, term: str):
+        entry = self._directory.get(term)
+        if entry is None:
+            return None
+        position, count = entry
+        return struct.unpack_from(f"<{count}I", self._mmap, position), struct.unpack_from(f"<{count}I", self._mmap, position + count * 4)
+
+    def _chunk(self, chunk_id: int) -> Document:
+        start, end = struct.unpack_from("<2Q", self._mmap, self._offsets_position + chunk_id * 8)
+        text_end = start + struct.unpack_from("<I", self._mmap, self._text_lengths_position + chunk_id * 4)[0]
+        return Document(page_content=self._mmap[start:text_end].decode("utf-8"), metadata=json.loads(self._mmap[text_end:end].decode("utf-8")))
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if not self.chunk_count:
+            return []
+        n = self.chunk_count
+        average_length = self.average_length or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self._posting(term)
+            if posting is None:
+                continue
+            chunk_ids, tfs = posting
+            idf = math.log(1 + (n - len(chunk_ids) + 0.5) / (len(chunk_ids) + 0.5))
+            for chunk_id, tf in zip(chunk_ids, tfs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self._chunk(chunk_id), score) for chunk_id, score in ranked]
+
+
+def load_document_index(document_id: int):
+    path = index_path(document_id)
+    if not os.path.exists(path):
+        return None
+    return BM25Index(path)
@@ -2,27 +2,35 @@
 
 import logging
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.exc import IntegrityError
-import fitz
 import database
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import shutil
 import os
+import json
+import time
+import re
+import uuid
+import hashlib
 from typing import List, Dict, Any 
 from datetime import datetime
 from typing import Optional
 
-from langchain_core.documents import Document
-
+import answer_cache
+import ingestion
+import metrics
 import nlp_utils
 import models
+import page_store
 import schemas
-from database import engine, Base, get_db
+import warmup
+from database import engine, get_async_db
 
 load_dotenv()
 
@@ -34,9 +42,27 @@ os.makedirs(PDF_DIR, exist_ok=True)
 os.makedirs(TEXT_DIR, exist_ok=True)
 os.makedirs(CHROMA_DB_DIR, exist_ok=True)
 
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__) 
 
+# Logging every retrieved chunk and the full answer is costly at volume; set LOG_QUESTION_CONTENT=false to log pages and sizes only.
+LOG_QUESTION_CONTENT = os.getenv("LOG_QUESTION_CONTENT", "true").lower() not in ("0", "false", "no")
+PAGE_RANGE_MAX = int(os.getenv("PAGE_RANGE_MAX", "50"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+# Upper bound on documents one cross-document question fans out to; "all" searches the most recently used ones.
+MULTI_DOCUMENT_MAX_DOCUMENTS = int(os.getenv("MULTI_DOCUMENT_MAX_DOCUMENTS", "20"))
+# Schema changes are applied out of band; set DB_CREATE_TABLES=true to create missing tables at startup.
+DB_CREATE_TABLES = os.getenv("DB_CREATE_TABLES", "false").lower() in ("1", "true", "yes")
+# last_queried_at only feeds warm-up ordering, so it is written at most this often per document.
+LAST_QUERIED_UPDATE_SECONDS = int(os.getenv("LAST_QUERIED_UPDATE_SECONDS", "60"))
+
+questions_total = metrics.counter("askmypdf_questions_total", "Answered questions by endpoint and whether the answer cache served them.", label_names=("endpoint", "source"))
+stream_time_to_first_token = metrics.histogram("askmypdf_stream_time_to_first_token_seconds", "Time from request to the first streamed answer token.")
+stream_total_latency = metrics.histogram("askmypdf_stream_total_latency_seconds", "Time from request to the end of the streamed answer.")
+
 app = FastAPI()
 
 origins = [
@@ -55,18 +81,72 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
-    logger.info("FastAPI startup event triggered. Creating/checking database tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created/checked.")
+    if DB_CREATE_TABLES:
+        logger.info("FastAPI startup event triggered. Creating/checking database tables...")
+        models.Base.metadata.create_all(bind=engine)
+        logger.info("Database tables created/checked.")
+    # Ingestion jobs live in this process, so a restart orphans any document that was mid-ingestion.
+    try:
+        ingestion.recover_interrupted_documents()
+    except Exception as e:
+        logger.error(f"Could not recover documents left by interrupted ingestion jobs: {e}", exc_info=True)
+    # Warm-up runs in the background; /ready reports when it has finished.
+    warmup.start()
 
-def generate_unique_filename(original_filename: str, db: Session) -> str:
+@app.get("/ready")
+def ready():
+    state = warmup.get_state()
+    return JSONResponse(status_code=200 if state["status"] == warmup.STATUS_READY else 503, content=state)
+
+async def generate_unique_filename(original_filename: str, db: AsyncSession) -> str:
     name, ext = os.path.splitext(original_filename)
+    escaped_name = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    escaped_ext = ext.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    result = await db.execute(
+        select(models.Document.filename).filter(or_(
+            models.Document.filename == original_filename,
+            models.Document.filename.like(f"{escaped_name} (%){escaped_ext}", escape="\\")
+        ))
+    )
+    taken = set(result.scalars().all())
+    if original_filename not in taken:
+        return original_filename
+    numbered = re.compile(re.escape(name) + r" \((\d+)\)" + re.escape(ext) + "$")
+    used_counters = {int(match.group(1)) for match in map(numbered.match, taken) if match}
     counter = 1
-    new_filename = original_filename
-    while db.query(models.Document).filter(models.Document.filename == new_filename).first():
-        new_filename = f"{name} ({counter}){ext}"
+    while counter in used_counters:
         counter += 1
-    return new_filename
+    return f"{name} ({counter}){ext}"
+
+async def get_document(db: AsyncSession, *criteria):
+    result = await db.execute(select(models.Document).filter(*criteria))
+    return result.scalars().first()
+
+class UploadTooLarge(Exception):
+    pass
+
+def save_upload(file: UploadFile, file_path: str):
+    """Streams the upload to disk in chunks, returning its SHA-256 and size; aborts past MAX_UPLOAD_BYTES."""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, "wb") as buffer:
+        while True:
+            chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge(f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes.")
+            sha256.update(chunk)
+            buffer.write(chunk)
+    return sha256.hexdigest(), size
+
+def remove_file(path: str, reason: str):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"Failed to remove file {path} {reason}: {e}")
 
 @app.get("/")
 async def read_root():
@@ -78,73 +158,66 @@ async def upload_pdf(
     file: UploadFile = File(...),
     action: Optional[str] = Form(None),
     existing_document_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     original_filename = secure_filename(file.filename)
     filename_to_use = original_filename
     file_path = ""
     text_file_path = ""
     db_document = None
+    slot_acquired = False
+    # Reservation (job id) from ingestion.reserve_document that has not been handed to submit_job yet.
+    reserved_job_id = None
+    upload_path = os.path.join(PDF_DIR, f".upload-{uuid.uuid4().hex}.part")
 
     try:
+        content_hash, size_bytes = await run_in_threadpool(save_upload, file, upload_path)
+        logging.info(f"Received '{original_filename}' ({size_bytes} bytes, sha256 {content_hash[:12]}).")
+
         if action == "overwrite" and existing_document_id is not None:
-            db_document = db.query(models.Document).filter(models.Document.id == existing_document_id).first()
+            db_document = await get_document(db, models.Document.id == existing_document_id)
             if not db_document or db_document.filename != original_filename:
                 raise HTTPException(status_code=400, detail="Mismatched document ID or filename for overwrite.")
+            # The job registry, not the stored status, decides: a row left "queued" by a restart can still be overwritten.
+            # Reserving before any further await keeps a concurrent overwrite of the same document out.
+            try:
+                reserved_job_id = ingestion.reserve_document(db_document.id)
+            except ingestion.DocumentBusy:
+                raise HTTPException(status_code=409, detail=f"Document ID {db_document.id} is still being processed (status: {db_document.status}).")
+            if db_document.content_hash == content_hash and db_document.status == ingestion.STATUS_READY:
+                logging.info(f"Overwrite of document ID {db_document.id} has identical content; keeping the existing index.")
+                return schemas.DocumentResponse(
+                    id=db_document.id,
+                    filename=db_document.filename,
+                    uploaded_at=db_document.uploaded_at,
+                    status=db_document.status,
+                    deduplicated=True,
+                    message="PDF content is unchanged; the existing index was kept."
+                )
 
             logging.info(f"Overwriting file '{original_filename}' (ID: {db_document.id}).")
 
-            old_vector_store_dir = os.path.join(CHROMA_DB_DIR, f"pdf_collection_{db_document.id}")
-            if os.path.exists(old_vector_store_dir):
-                logging.info(f"Removing old vector store: {old_vector_store_dir}")
-                shutil.rmtree(old_vector_store_dir)
-
-            old_text_file_path = os.path.join(TEXT_DIR, os.path.splitext(original_filename)[0] + ".txt")
-            if os.path.exists(old_text_file_path):
-                logging.info(f"Removing old text file: {old_text_file_path}")
-                os.remove(old_text_file_path)
-
-            file_path = os.path.join(PDF_DIR, original_filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            logging.info(f"Overwritten PDF file: {file_path}")
-
-            extracted_documents_with_metadata = []
-            with fitz.open(file_path) as doc:
-                full_text_content = ""
-                for i, page in enumerate(doc):
-                    page_text = page.get_text()
-                    full_text_content += f"\n--- Page {i+1} ---\n" + page_text
-                    extracted_documents_with_metadata.append(
-                        Document(page_content=page_text, metadata={"page": i + 1})
-                    )
-
-            text_filename = os.path.splitext(original_filename)[0] + ".txt"
-            text_file_path = os.path.join(TEXT_DIR, text_filename)
-            with open(text_file_path, "w", encoding="utf-8") as text_file:
-                text_file.write(full_text_content)
-
-            nlp_utils.process_documents_and_create_vector_store(extracted_documents_with_metadata, db_document.id)
-            logging.info(f"Vector store re-processed for existing document ID: {db_document.id}")
-
-            db_document.uploaded_at = datetime.now()
-            db.add(db_document)
-            db.commit()
-            db.refresh(db_document)
+        elif action == "new":
+            # An explicit "upload as new" always creates a document, even for bytes that are already indexed.
+            filename_to_use = await generate_unique_filename(original_filename, db)
+            logging.info(f"Uploading as new file: '{filename_to_use}'")
 
+        elif (
+            (identical_document := await get_document(db, models.Document.content_hash == content_hash, models.Document.status == ingestion.STATUS_READY)) is not None
+            and not ingestion.get_active_job_id(identical_document.id)
+        ):
+            logging.info(f"Upload of '{original_filename}' is byte-identical to document ID {identical_document.id}; reusing its index.")
             return schemas.DocumentResponse(
-                id=db_document.id,
-                filename=db_document.filename,
-                uploaded_at=db_document.uploaded_at,
-                message="PDF content updated and re-processed successfully."
+                id=identical_document.id,
+                filename=identical_document.filename,
+                uploaded_at=identical_document.uploaded_at,
+                status=identical_document.status,
+                deduplicated=True,
+                message=f"An identical PDF was already processed as '{identical_document.filename}'. Its index is being reused."
             )
 
-        elif action == "new":
-            filename_to_use = generate_unique_filename(original_filename, db)
-            logging.info(f"Uploading as new file: '{filename_to_use}'")
-
         else:
-            existing_db_document = db.query(models.Document).filter(models.Document.filename == original_filename).first()
+            existing_db_document = await get_document(db, models.Document.filename == original_filename)
             if existing_db_document:
                 logging.info(f"Duplicate filename '{original_filename}' detected for ID: {existing_db_document.id}. Awaiting user action.")
                 return JSONResponse(
@@ -157,128 +230,224 @@ async def upload_pdf(
                 )
             logging.info(f"Proceeding with initial upload of '{filename_to_use}'")
 
+        ingestion.acquire_slot()
+        slot_acquired = True
+
         file_path = os.path.join(PDF_DIR, filename_to_use)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        extracted_documents_with_metadata = []
-        with fitz.open(file_path) as doc:
-            full_text_content = ""
-            for i, page in enumerate(doc):
-                page_text = page.get_text()
-                full_text_content += f"\n--- Page {i+1} ---\n" + page_text
-                extracted_documents_with_metadata.append(
-                    Document(page_content=page_text, metadata={"page": i + 1})
-                )
+        os.replace(upload_path, file_path)
 
         text_filename = os.path.splitext(filename_to_use)[0] + ".txt"
         text_file_path = os.path.join(TEXT_DIR, text_filename)
-        with open(text_file_path, "w", encoding="utf-8") as text_file:
-            text_file.write(full_text_content)
 
-        db_document = models.Document(filename=filename_to_use)
+        replace_existing = db_document is not None
+        if replace_existing:
+            db_document.uploaded_at = datetime.now()
+        else:
+            db_document = models.Document(filename=filename_to_use)
+        # A ready document keeps answering from its current index until the re-index is swapped in.
+        if db_document.status != ingestion.STATUS_READY:
+            db_document.status = ingestion.STATUS_QUEUED
         db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
-
-        logging.info(f"File '{filename_to_use}' saved and document ID {db_document.id} created. Starting NLP processing.")
+        await db.commit()
+        await db.refresh(db_document)
+        if reserved_job_id is None:
+            reserved_job_id = ingestion.reserve_document(db_document.id)
 
-        nlp_utils.process_documents_and_create_vector_store(extracted_documents_with_metadata, db_document.id)
-        logging.info(f"NLP processing complete for document ID: {db_document.id}")
+        # content_hash and size_bytes are recorded by the job once the new index is live.
+        job_id = ingestion.submit_job(reserved_job_id, db_document.id, file_path, text_file_path, content_hash, size_bytes, replace_existing=replace_existing)
+        slot_acquired = False
+        reserved_job_id = None
+        logging.info(f"File '{filename_to_use}' saved for document ID {db_document.id}. Ingestion job {job_id} queued.")
 
         return schemas.DocumentResponse(
             id=db_document.id,
             filename=db_document.filename,
             uploaded_at=db_document.uploaded_at,
-            message="PDF uploaded and processed successfully."
+            status=db_document.status,
+            job_id=job_id,
+            message="PDF uploaded. Processing has started." if not replace_existing else "PDF content updated. Re-processing has started."
         )
 
+    except UploadTooLarge as e:
+        logging.warning(f"Rejected upload of {original_filename}: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ingestion.IngestionQueueFull as e:
+        logging.warning(f"Rejected upload of {filename_to_use}: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
     except IntegrityError:
-        db.rollback()
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except OSError as e:
-                logging.error(f"Failed to remove file {file_path} after IntegrityError: {e}")
-        if text_file_path and os.path.exists(text_file_path):
-            try:
-                os.remove(text_file_path)
-            except OSError as e:
-                logging.error(f"Failed to remove text file {text_file_path} after IntegrityError: {e}")
+        await db.rollback()
+        remove_file(file_path, "after IntegrityError")
+        remove_file(text_file_path, "after IntegrityError")
         logging.error(f"IntegrityError during upload for {filename_to_use}.")
         raise HTTPException(status_code=409, detail=f"A PDF with filename '{filename_to_use}' was concurrently added.")
     except Exception as e:
-        db.rollback()
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except OSError as e_remove:
-                logging.error(f"Failed to remove file {file_path} after processing error: {e_remove}")
-        if text_file_path and os.path.exists(text_file_path):
-            try:
-                os.remove(text_file_path)
-            except OSError as e_remove_text:
-                logging.error(f"Failed to remove text file {text_file_path} after processing error: {e_remove_text}")
+        await db.rollback()
+        remove_file(file_path, "after processing error")
+        remove_file(text_file_path, "after processing error")
         logging.error(f"Error processing file {filename_to_use}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Could not process file: {e}")
+    finally:
+        remove_file(upload_path, "after upload")
+        if slot_acquired:
+            ingestion.release_slot()
+        if reserved_job_id is not None:
+            ingestion.release_document(db_document.id, reserved_job_id)
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatusResponse)
+async def get_job_status(job_id: str):
+    job = ingestion.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return schemas.JobStatusResponse(**job)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache-stats/")
+async def get_cache_stats():
+    return nlp_utils.get_cache_stats()
+
+@app.get("/embedding-stats/")
+async def get_embedding_stats():
+    return nlp_utils.get_embedding_stats()
 
 @app.get("/documents/", response_model=List[schemas.DocumentResponse])
-async def get_documents(db: Session = Depends(get_db)):
-    documents = db.query(models.Document).all()
-    return [schemas.DocumentResponse(document_id=doc.id, filename=doc.filename, message="Loaded") for doc in documents]
+async def get_documents(db: AsyncSession = Depends(get_async_db)):
+    documents = (await db.execute(select(models.Document))).scalars().all()
+    return [schemas.DocumentResponse(id=doc.id, filename=doc.filename, uploaded_at=doc.uploaded_at, status=doc.status, message="Loaded") for doc in documents]
+
+@app.get("/documents/{document_id}/pages", response_model=schemas.PageRangeResponse)
+async def get_document_pages(document_id: int, start: int = 1, end: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Returns the extracted text of pages start..end (inclusive) from the document's page store."""
+    if not await get_document(db, models.Document.id == document_id):
+        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found.")
+    end = start if end is None else end
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start.")
+    if end - start + 1 > PAGE_RANGE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PAGE_RANGE_MAX} pages can be requested at once.")
+
+    store = await run_in_threadpool(page_store.open_store, document_id)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"No page store for document ID {document_id}. Re-upload the PDF to build one.")
+    if start > store.last_page or end < store.first_page:
+        raise HTTPException(status_code=404, detail=f"Pages {start}-{end} are out of range (document has pages {store.first_page}-{store.last_page}).")
+    pages = store.get_pages(start, end)
+    return schemas.PageRangeResponse(
+        document_id=document_id,
+        page_count=store.page_count,
+        pages=[schemas.PageText(page=page_number, text=text) for page_number, text in pages]
+    )
+
+async def get_ready_document(document_id: int, question: str, db: AsyncSession) -> models.Document:
+    db_document = await get_document(db, models.Document.id == document_id)
+    if not db_document:
+        logging.warning(f"Document with ID {document_id} not found for question: '{question}'")
+        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found.")
+    if db_document.status != ingestion.STATUS_READY:
+        logging.info(f"Document ID {document_id} is not ready (status: {db_document.status}).")
+        raise HTTPException(status_code=409, detail=f"Document with ID {document_id} is not ready yet (status: {db_document.status}). Please try again once indexing has finished.")
+    await touch_last_queried(db_document)
+    return db_document
+
+async def touch_last_queried(db_document: models.Document):
+    now = datetime.now()
+    last_queried_at = db_document.last_queried_at
+    if last_queried_at is not None and (now - last_queried_at).total_seconds() < LAST_QUERIED_UPDATE_SECONDS:
+        return
+    try:
+        # A separate session, so a failed write cannot roll back or expire the request's objects.
+        async with database.AsyncSessionLocal() as session:
+            await session.execute(update(models.Document).where(models.Document.id == db_document.id).values(last_queried_at=now))
+            await session.commit()
+    except Exception as e:
+        logging.warning(f"Could not record last_queried_at for document ID {db_document.id}: {e}")
+
+def format_sources(source_documents_raw, metadata_keys=('page',)) -> List[schemas.SourceDocument]:
+    source_documents_formatted = []
+    for doc in source_documents_raw:
+        formatted_metadata = {k: v for k, v in doc.metadata.items() if k in metadata_keys}
+        source_documents_formatted.append(
+            schemas.SourceDocument(
+                page_content=doc.page_content,
+                metadata=formatted_metadata
+            )
+        )
+    return source_documents_formatted
+
+def lookup_answer_cache(document_id: int, question: str):
+    entry = answer_cache.answer_cache.get_exact(document_id, question)
+    if entry is not None:
+        return entry, answer_cache.TIER_EXACT, None
+    question_embedding = None
+    if nlp_utils.RETRIEVAL_MODE == "lexical":
+        # Lexical mode promises no embedding round trip, so only the exact tier is consulted.
+        return None, None, None
+    try:
+        question_embedding = nlp_utils.embed_question(question)
+        entry = answer_cache.answer_cache.get_semantic(document_id, question_embedding)
+    except Exception as e:
+        logging.warning(f"Semantic answer cache lookup failed for document ID {document_id}: {e}")
+    if entry is not None:
+        return entry, answer_cache.TIER_SEMANTIC, question_embedding
+    return None, None, question_embedding
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.post("/ask-question/{document_id}", response_model=schemas.QuestionResponse)
 async def ask_question(
     document_id: int,
     request: schemas.QuestionRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     question = request.question
 
     logging.info(f"Received question for document ID {document_id}: '{question}'")
-
-    db_document = db.query(models.Document).filter(models.Document.id == document_id).first()
-    if not db_document:
-        logging.warning(f"Document with ID {document_id} not found for question: '{question}'")
-        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found.")
+    await get_ready_document(document_id, question, db)
 
     try:
-        qa_chain = nlp_utils.get_qa_chain(document_id)
-        if qa_chain is None:
-            raise HTTPException(status_code=500, detail="Could not load QA system for the document. Please ensure the PDF was processed correctly.")
+        # Read before answering, so an answer finishing after a re-index swap is not cached under the new index.
+        index_version = nlp_utils.get_index_version(document_id)
+        cached_answer, cache_tier, question_embedding = await run_in_threadpool(lookup_answer_cache, document_id, question)
+        if cached_answer is not None:
+            logging.info(f"Answer for document ID {document_id} served from {cache_tier} answer cache.")
+            questions_total.inc(endpoint="ask-question", source="cache")
+            return schemas.QuestionResponse(
+                answer=cached_answer["answer"],
+                document_id=document_id,
+                question=question,
+                sources=[schemas.SourceDocument(**source) for source in cached_answer["sources"]],
+                cached=True,
+                cache_tier=cache_tier
+            )
 
         logging.info(f"Invoking QA chain with question: {request.question}")
-        response = qa_chain.invoke({"query": request.question, "chat_history": []})
-
-        logging.info(f"Raw QA Chain Result: {response}")
+        answer, source_documents_raw, context_stats = await run_in_threadpool(nlp_utils.answer_question, document_id, question)
+        questions_total.inc(endpoint="ask-question", source="model")
 
-        answer = response.get("result", "No answer found.")
-        source_documents_raw = response.get("source_documents", [])
-
-        if source_documents_raw:
+        if not source_documents_raw:
+            logging.info("No source documents retrieved by the QA chain.")
+        elif LOG_QUESTION_CONTENT:
             for i, doc in enumerate(source_documents_raw):
                 logging.info(f"Retrieved Source Document {i+1} (Page {doc.metadata.get('page')}, Filename: {doc.metadata.get('filename')}): {doc.page_content[:500]}...")
-        else:
-            logging.info("No source documents retrieved by the QA chain.")
 
-        source_documents_formatted = []
-        for doc in source_documents_raw:
-            formatted_metadata = {k: v for k, v in doc.metadata.items() if k in ['page']}
-            source_documents_formatted.append(
-                schemas.SourceDocument(
-                    page_content=doc.page_content,
-                    metadata=formatted_metadata
-                )
-            )
+        source_documents_formatted = format_sources(source_documents_raw)
 
-        logging.info(f"Answer generated for document ID {document_id}: '{answer[:50]}...'")
+        if LOG_QUESTION_CONTENT:
+            logging.info(f"Answer generated for document ID {document_id}: '{answer[:50]}...'")
         logging.info(f"Source documents found from pages: {[doc.metadata.get('page') for doc in source_documents_raw if doc.metadata.get('page')]}")
+        answer_cache.answer_cache.put(document_id, question, answer, [source.model_dump() for source in source_documents_formatted], question_embedding, index_version)
 
         return schemas.QuestionResponse(
             answer=answer,
             document_id=document_id,
             question=question,
-            sources=source_documents_formatted
+            sources=source_documents_formatted,
+            context_tokens=context_stats
         )
     except HTTPException as http_exc:
         raise http_exc
@@ -286,11 +455,229 @@ async def ask_question(
         logging.error(f"Error answering question for document ID {document_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing question: {e}.")
 
+@app.post("/ask-question-stream/{document_id}")
+async def ask_question_stream(
+    document_id: int,
+    request: schemas.QuestionRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    question = request.question
+    started = time.perf_counter()
+
+    logging.info(f"Received streaming question for document ID {document_id}: '{question}'")
+    await get_ready_document(document_id, question, db)
+
+    def event_stream():
+        answer_parts = []
+        sources = []
+        context_stats = None
+        time_to_first_token = None
+        try:
+            index_version = nlp_utils.get_index_version(document_id)
+            cached_answer, cache_tier, question_embedding = lookup_answer_cache(document_id, question)
+            if cached_answer is not None:
+                total_latency = time.perf_counter() - started
+                yield sse_event("sources", {"document_id": document_id, "question": question, "sources": cached_answer["sources"], "retrieval_latency": total_latency})
+                yield sse_event("token", {"token": cached_answer["answer"]})
+                yield sse_event("done", {"answer": cached_answer["answer"], "time_to_first_token": total_latency, "total_latency": total_latency, "cached": True, "cache_tier": cache_tier})
+                questions_total.inc(endpoint="ask-question-stream", source="cache")
+                return
+
+            for kind, payload in nlp_utils.stream_answer(document_id, question):
+                if kind == "sources":
+                    sources = [source.model_dump() for source in format_sources(payload)]
+                    yield sse_event("sources", {
+                        "document_id": document_id,
+                        "question": question,
+                        "sources": sources,
+                        "retrieval_latency": time.perf_counter() - started
+                    })
+                    continue
+                if kind == "context":
+                    context_stats = payload
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - started
+                    stream_time_to_first_token.observe(time_to_first_token)
+                answer_parts.append(payload)
+                yield sse_event("token", {"token": payload})
+
+            total_latency = time.perf_counter() - started
+            stream_total_latency.observe(total_latency)
+            questions_total.inc(endpoint="ask-question-stream", source="model")
+            logging.info(f"Streamed answer for document ID {document_id}: time to first token {time_to_first_token}, total {total_latency:.3f}s")
+            answer = "".join(answer_parts)
+            answer_cache.answer_cache.put(document_id, question, answer, sources, question_embedding, index_version)
+            yield sse_event("done", {
+                "answer": answer,
+                "time_to_first_token": time_to_first_token,
+                "total_latency": total_latency,
+                "cached": False,
+                "cache_tier": None,
+                "context_tokens": context_stats
+            })
+        except Exception as e:
+            logging.error(f"Error streaming answer for document ID {document_id}: {e}", exc_info=True)
+            yield sse_event("error", {"detail": f"Error processing question: {e}."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/ask-question-multi/", response_model=schemas.MultiDocumentQuestionResponse)
+async def ask_question_multi(request: schemas.MultiDocumentQuestionRequest, db: AsyncSession = Depends(get_async_db)):
+    """Answers one question from the merged top-k chunks of several documents (or all ready documents)."""
+    question = request.question
+    if request.document_ids == "all":
+        result = await db.execute(
+            select(models.Document)
+            .filter(models.Document.status == ingestion.STATUS_READY)
+            .order_by(models.Document.last_queried_at.desc().nullslast(), models.Document.uploaded_at.desc())
+            .limit(MULTI_DOCUMENT_MAX_DOCUMENTS)
+        )
+        documents = result.scalars().all()
+    else:
+        requested_ids = list(dict.fromkeys(request.document_ids))
+        if len(requested_ids) > MULTI_DOCUMENT_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {MULTI_DOCUMENT_MAX_DOCUMENTS} documents can be searched in one question.")
+        result = await db.execute(select(models.Document).filter(models.Document.id.in_(requested_ids)))
+        documents = result.scalars().all()
+        missing_ids = set(requested_ids) - {document.id for document in documents}
+        if missing_ids:
+            raise HTTPException(status_code=404, detail=f"Documents not found: {sorted(missing_ids)}.")
+        not_ready = [document.id for document in documents if document.status != ingestion.STATUS_READY]
+        if not_ready:
+            raise HTTPException(status_code=409, detail=f"Documents not ready yet: {sorted(not_ready)}. Please try again once indexing has finished.")
+    if not documents:
+        raise HTTPException(status_code=404, detail="No ready documents to search.")
+
+    document_ids = [document.id for document in documents]
+    filenames = {document.id: document.filename for document in documents}
+    logging.info(f"Received question across {len(document_ids)} documents: '{question}'")
+    try:
+        answer, source_documents_raw, context_stats = await run_in_threadpool(
+            nlp_utils.answer_question_across_documents,
+            document_ids,
+            question,
+            request.k or nlp_utils.RETRIEVAL_K,
+            request.per_document_limit
+        )
+    except Exception as e:
+        logging.error(f"Error answering question across documents {document_ids}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing question: {e}.")
+    questions_total.inc(endpoint="ask-question-multi", source="model")
+    logging.info(f"Cross-document sources: {[(doc.metadata.get('document_id'), doc.metadata.get('page')) for doc in source_documents_raw]}")
+
+    sources = format_sources(source_documents_raw, metadata_keys=('document_id', 'page'))
+    for source in sources:
+        source.metadata["filename"] = filenames.get(source.metadata.get("document_id"))
+    return schemas.MultiDocumentQuestionResponse(answer=answer, sources=sources, document_ids=document_ids, question=question, context_tokens=context_stats)
+
+def cached_batch_answer(document_id: int, index: int, question: str, entry: dict, cache_tier: str) -> schemas.BatchAnswer:
+    questions_total.inc(endpoint="ask-questions", source="cache")
+    return schemas.BatchAnswer(
+        index=index,
+        answer=entry["answer"],
+        document_id=document_id,
+        question=question,
+        sources=[schemas.SourceDocument(**source) for source in entry["sources"]],
+        cached=True,
+        cache_tier=cache_tier
+    )
+
+def iter_batch_answers(document_id: int, questions: List[str]):
+    """Yields one BatchAnswer per question as it completes: cache hits first, then model answers."""
+    index_version = nlp_utils.get_index_version(document_id)
+    pending = []
+    for index, question in enumerate(questions):
+        entry = answer_cache.answer_cache.get_exact(document_id, question)
+        if entry is not None:
+            yield cached_batch_answer(document_id, index, question, entry, answer_cache.TIER_EXACT)
+        else:
+            pending.append(index)
+
+    question_embeddings = {}
+    if pending and nlp_utils.RETRIEVAL_MODE != "lexical":
+        try:
+            vectors = nlp_utils.embed_questions([questions[index] for index in pending])
+        except Exception as e:
+            logging.warning(f"Batched question embedding failed for document ID {document_id}: {e}")
+            vectors = []
+        still_pending = []
+        for index, vector in zip(pending, vectors):
+            question_embeddings[index] = vector
+            entry = answer_cache.answer_cache.get_semantic(document_id, vector)
+            if entry is not None:
+                yield cached_batch_answer(document_id, index, questions[index], entry, answer_cache.TIER_SEMANTIC)
+            else:
+                still_pending.append(index)
+        if vectors:
+            pending = still_pending
+    if not pending:
+        return
+
+    # Repeated questions in one batch are answered once.
+    indices_by_question = {}
+    for index in pending:
+        indices_by_question.setdefault(questions[index], []).append(index)
+    unique_questions = list(indices_by_question)
+    logging.info(f"Answering {len(unique_questions)} of {len(questions)} batched questions for document ID {document_id} with the model.")
+    pending_embeddings = [question_embeddings[indices_by_question[question][0]] for question in unique_questions] if question_embeddings else None
+    for position, answer, source_documents_raw, context_stats, error in nlp_utils.answer_questions(document_id, unique_questions, pending_embeddings):
+        question = unique_questions[position]
+        sources = format_sources(source_documents_raw)
+        if error is None:
+            answer_cache.answer_cache.put(document_id, question, answer, [source.model_dump() for source in sources], question_embeddings.get(indices_by_question[question][0]), index_version)
+        for index in indices_by_question[question]:
+            if error is None:
+                questions_total.inc(endpoint="ask-questions", source="model")
+            yield schemas.BatchAnswer(index=index, answer=answer, document_id=document_id, question=question, sources=sources, context_tokens=context_stats, error=error)
+
+@app.post("/ask-questions/{document_id}", response_model=schemas.BatchQuestionResponse)
+async def ask_questions(
+    document_id: int,
+    request: schemas.BatchQuestionRequest,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Answers a list of questions in one round trip; with stream=true each answer is sent as an SSE event as it completes."""
+    questions = request.questions
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions can be asked in one batch.")
+
+    logging.info(f"Received batch of {len(questions)} questions for document ID {document_id}")
+    await get_ready_document(document_id, f"<batch of {len(questions)}>", db)
+
+    if stream:
+        def event_stream():
+            try:
+                for batch_answer in iter_batch_answers(document_id, questions):
+                    yield sse_event("answer", batch_answer.model_dump())
+                yield sse_event("done", {"document_id": document_id, "count": len(questions)})
+            except Exception as e:
+                logging.error(f"Error streaming batch answers for document ID {document_id}: {e}", exc_info=True)
+                yield sse_event("error", {"detail": f"Error processing questions: {e}."})
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    try:
+        answers = await run_in_threadpool(lambda: list(iter_batch_answers(document_id, questions)))
+    except Exception as e:
+        logging.error(f"Error answering batch for document ID {document_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing questions: {e}.")
+    return schemas.BatchQuestionResponse(document_id=document_id, answers=sorted(answers, key=lambda batch_answer: batch_answer.index))
+
 @app.post("/submit-feedback/", status_code=200)
-async def submit_feedback(feedback_request: schemas.FeedbackRequest, db: Session = Depends(get_db)):
+async def submit_feedback(feedback_request: schemas.FeedbackRequest, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Received feedback for document ID {feedback_request.document_id}, type: {feedback_request.feedback_type}")
 
-    db_document = db.query(models.Document).filter(models.Document.id == feedback_request.document_id).first()
+    db_document = await get_document(db, models.Document.id == feedback_request.document_id)
     if not db_document:
         logger.warning(f"Attempted to submit feedback for non-existent document ID: {feedback_request.document_id}")
         raise HTTPException(status_code=404, detail=f"Document with ID {feedback_request.document_id} not found.")
@@ -303,18 +690,18 @@ async def submit_feedback(feedback_request: schemas.FeedbackRequest, db: Session
             feedback_type=feedback_request.feedback_type
         )
         db.add(db_feedback)
-        db.commit()
-        db.refresh(db_feedback)
+        await db.commit()
+        await db.refresh(db_feedback)
         logger.info(f"Feedback submitted successfully for document ID {feedback_request.document_id}, Feedback ID: {db_feedback.id}")
         return {"message": "Feedback submitted successfully."}
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"IntegrityError submitting feedback for document ID {feedback_request.document_id}: {e}", exc_info=True)
         if "FOREIGN KEY constraint failed" in str(e) or "REFERENCES" in str(e):
             raise HTTPException(status_code=400, detail="Invalid document ID or related data.")
         else:
             raise HTTPException(status_code=409, detail="A conflict occurred while submitting feedback. It might be a duplicate entry or invalid data.")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error submitting feedback for document ID {feedback_request.document_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,85 @@
+# backend/migrate_database.py
+"""Brings an existing database up to the current models: creates missing tables, columns and indexes.
+
+Run from the project root: ``python backend/migrate_database.py [--dry-run]``. It uses DATABASE_URL like
+the server and only adds, never drops or alters, so it is safe to re-run. Columns added this way on
+``documents``: status (existing rows become 'ready'), content_hash, size_bytes and last_queried_at.
+``--dry-run`` prints the statements instead of executing them.
+"""
+
+import argparse
+import logging
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+
+import database
+import models
+
+
+def _column_definition(column, dialect) -> str:
+    definition = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        # Only literal server defaults are supported; a NOT NULL column needs one to be added to existing rows.
+        default = str(column.server_default.arg).replace("'", "''")
+        definition += f" DEFAULT '{default}'"
+    if not column.nullable:
+        if column.server_default is None:
+            raise ValueError(f"Cannot add NOT NULL column {column.table.name}.{column.name} without a server default.")
+        definition += " NOT NULL"
+    return definition
+
+
+def pending_statements(engine) -> List[str]:
+    """Returns the DDL needed for the tables in models.Base that already exist but lack columns or indexes."""
+    inspector = inspect(engine)
+    dialect = engine.dialect
+    statements = []
+    existing_tables = set(inspector.get_table_names())
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                table_name = dialect.identifier_preparer.quote(table.name)
+                statements.append(f"ALTER TABLE {table_name} ADD COLUMN {_column_definition(column, dialect)}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing_indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return statements
+
+
+def migrate(engine, dry_run: bool = False) -> List[str]:
+    statements = pending_statements(engine)
+    if dry_run:
+        return statements
+    with engine.begin() as connection:
+        for statement in statements:
+            logging.info(f"Executing: {statement}")
+            connection.exec_driver_sql(statement)
+    # Tables that do not exist yet are created whole, with their indexes.
+    models.Base.metadata.create_all(bind=engine)
+    return statements
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements without executing them.")
+    args = parser.parse_args()
+
+    statements = migrate(database.engine, dry_run=args.dry_run)
+    if args.dry_run:
+        for statement in statements:
+            print(f"{statement};")
+    elif not statements:
+        logging.info("Database schema is already up to date.")
+    else:
+        logging.info(f"Applied {len(statements)} schema changes.")
+
+
+if __name__ == "__main__":
+    main()
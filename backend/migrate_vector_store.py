@@ -0,0 +1,72 @@
+# backend/migrate_vector_store.py
+"""Copies per-document Chroma directories (pdf_collection_<id>[_v<version>]) into the shared collection.
+
+Run from the project root: ``python backend/migrate_vector_store.py [--remove-old]``, then start the
+server with ``VECTOR_STORE_MODE=shared``. Vectors are copied as-is, so nothing is re-embedded. Only the
+live index version of each document is copied; its index_version metadata keeps the version pointer valid.
+"""
+
+import argparse
+import logging
+import os
+import re
+import shutil
+
+import chromadb
+
+import nlp_utils
+
+COLLECTION_DIR_PATTERN = re.compile(r"^pdf_collection_(\d+)(?:_v([0-9a-f]+))?$")
+COPY_BATCH_SIZE = 1000
+
+
+def migrate_document(shared_collection, document_id: int, persist_directory: str) -> int:
+    client = chromadb.PersistentClient(path=persist_directory)
+    source = client.get_collection(f"pdf_collection_{document_id}")
+    # Drop anything from a previous partial run so the copy is idempotent.
+    shared_collection.delete(where={"document_id": document_id})
+
+    copied = 0
+    total = source.count()
+    for offset in range(0, total, COPY_BATCH_SIZE):
+        records = source.get(offset=offset, limit=COPY_BATCH_SIZE, include=["embeddings", "documents", "metadatas"])
+        if not records["ids"]:
+            break
+        metadatas = [dict(m or {}, document_id=document_id) for m in records["metadatas"]]
+        shared_collection.add(
+            ids=records["ids"],
+            embeddings=records["embeddings"],
+            documents=records["documents"],
+            metadatas=metadatas,
+        )
+        copied += len(records["ids"])
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--remove-old", action="store_true", help="Delete each per-document directory after it is copied.")
+    args = parser.parse_args()
+
+    shared_collection = nlp_utils.get_shared_client().get_or_create_collection(nlp_utils.SHARED_COLLECTION_NAME)
+    for entry in sorted(os.listdir(nlp_utils.CHROMA_DB_DIR)):
+        match = COLLECTION_DIR_PATTERN.match(entry)
+        if not match:
+            continue
+        document_id = int(match.group(1))
+        if match.group(2) != nlp_utils.get_index_version(document_id):
+            continue
+        persist_directory = os.path.join(nlp_utils.CHROMA_DB_DIR, entry)
+        try:
+            copied = migrate_document(shared_collection, document_id, persist_directory)
+        except Exception as e:
+            logging.error(f"Failed to migrate document ID {document_id} from {persist_directory}: {e}", exc_info=True)
+            continue
+        logging.info(f"Migrated {copied} chunks for document ID {document_id}")
+        if args.remove_old:
+            shutil.rmtree(persist_directory)
+            logging.info(f"Removed {persist_directory}")
+
+
+if __name__ == "__main__":
+    main()
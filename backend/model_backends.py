@@ -0,0 +1,129 @@
+# backend/model_backends.py
+"""Registry of model backends. Provider SDKs are imported and clients created on first use, so
+importing the app needs neither the SDKs' import time nor an API key."""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", MODEL_BACKEND)
+# LLM_PROVIDER=fake predates the registry and still selects the local chat model.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "local" if os.getenv("LLM_PROVIDER") == "fake" else MODEL_BACKEND)
+
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+GEMINI_CHAT_MODEL = "gemini-1.5-flash"
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "256"))
+
+
+class ModelBackend:
+    def __init__(self, name: str, embedding_model_name: str, create_embeddings: Callable[[], Embeddings], create_llm: Callable[[], object]):
+        self.name = name
+        # Part of the embedding cache key, so vectors from different backends never mix.
+        self.embedding_model_name = embedding_model_name
+        self.create_embeddings = create_embeddings
+        self.create_llm = create_llm
+
+
+_registry: Dict[str, ModelBackend] = {}
+
+
+def register_backend(backend: ModelBackend):
+    _registry[backend.name] = backend
+
+
+def get_backend(name: str) -> ModelBackend:
+    backend = _registry.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown model backend '{name}'. Registered backends: {', '.join(sorted(_registry))}.")
+    return backend
+
+
+def _google_api_key() -> str:
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        logging.error("GOOGLE_API_KEY not found in environment variables. Please set it.")
+        raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
+    return api_key
+
+
+def _gemini_embeddings() -> Embeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDING_MODEL, google_api_key=_google_api_key())
+
+
+def _gemini_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=GEMINI_CHAT_MODEL, google_api_key=_google_api_key())
+
+
+def _local_embeddings() -> Embeddings:
+    import fake_models
+    return fake_models.DeterministicEmbeddings(dimensions=LOCAL_EMBEDDING_DIMENSIONS)
+
+
+def _local_llm():
+    import fake_models
+    return fake_models.FakeStreamingChatModel(
+        responses=["This is a canned answer from the offline stand-in model."],
+        token_delay=float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+    )
+
+
+register_backend(ModelBackend("gemini", GEMINI_EMBEDDING_MODEL, _gemini_embeddings, _gemini_llm))
+register_backend(ModelBackend("local", f"local/deterministic-{LOCAL_EMBEDDING_DIMENSIONS}", _local_embeddings, _local_llm))
+
+
+def embedding_model_name() -> str:
+    return get_backend(EMBEDDING_BACKEND).embedding_model_name
+
+
+class LazyEmbeddings(Embeddings):
+    """Creates the configured backend's embedding client on first use."""
+
+    def __init__(self, backend_name: str = None):
+        self.backend_name = backend_name or EMBEDDING_BACKEND
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def wrapped(self) -> Embeddings:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    start = time.perf_counter()
+                    self._client = get_backend(self.backend_name).create_embeddings()
+                    logging.info(f"Created {self.backend_name} embedding client in {time.perf_counter() - start:.3f}s")
+        return self._client
+
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    def embed_documents(self, texts):
+        return self.wrapped.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.wrapped.embed_query(text)
+
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                start = time.perf_counter()
+                _llm = get_backend(LLM_BACKEND).create_llm()
+                logging.info(f"Created {LLM_BACKEND} chat model in {time.perf_counter() - start:.3f}s")
+    return _llm
@@ -12,6 +12,11 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, unique=True, index=True, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    status = Column(String(20), nullable=False, default="ready", server_default="ready")
+    content_hash = Column(String(64), index=True, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    # Bumped (at most once a minute) when the document is queried; warm-up preloads the most recent ones.
+    last_queried_at = Column(DateTime, nullable=True, index=True)
 
     feedbacks = relationship("Feedback", back_populates="document")
 
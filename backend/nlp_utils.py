@@ -1,76 +1,837 @@
 # backend/nlp_utils.py (updated for Google Gemini API)
+# Chroma, the LangChain chains and the provider SDKs are imported where first used, so importing this
+# module stays cheap; model clients come from model_backends on first use.
+import hashlib
 import os
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import RetrievalQA
+import random
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_core.documents import Document
-from typing import List
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 import logging
 
+import answer_cache
+import context_assembly
+import embedding_cache
+import lexical_index
+import metrics
+import model_backends
+import page_store
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    logging.error("GOOGLE_API_KEY not found in environment variables. Please set it.")
-    raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_REQUESTS_PER_SECOND = float(os.getenv("EMBED_REQUESTS_PER_SECOND", "10"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_RETRY_BASE_DELAY = float(os.getenv("EMBED_RETRY_BASE_DELAY", "0.5"))
+EMBED_RETRY_MAX_DELAY = float(os.getenv("EMBED_RETRY_MAX_DELAY", "20"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _is_rate_limit_error(exc: Exception) -> bool:
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code in (429, 503):
+        return True
+    name = type(exc).__name__
+    return name in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable") or "429" in str(exc)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeds in fixed-size batches with bounded concurrency, token-bucket rate limiting and jittered retries."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        requests_per_second: float = EMBED_REQUESTS_PER_SECOND,
+        max_retries: int = EMBED_MAX_RETRIES,
+        retry_base_delay: float = EMBED_RETRY_BASE_DELAY,
+        retry_max_delay: float = EMBED_RETRY_MAX_DELAY,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._bucket = TokenBucket(requests_per_second)
+        # Shared by every caller so concurrent ingests together stay under max_in_flight requests.
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"batches": 0, "texts": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def _call_with_retries(self, fn, *args):
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            with self._in_flight:
+                start = time.perf_counter()
+                try:
+                    result = fn(*args)
+                except Exception as e:
+                    rate_limited = _is_rate_limit_error(e)
+                    with self._stats_lock:
+                        self._stats["rate_limited" if rate_limited else "failures"] += 1
+                    if not rate_limited or attempt >= self.max_retries:
+                        raise
+                else:
+                    with self._stats_lock:
+                        self._latencies.append(time.perf_counter() - start)
+                    return result
+            delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+            attempt += 1
+            with self._stats_lock:
+                self._stats["retries"] += 1
+            logging.warning(f"Embedding request throttled; retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        with metrics.span("embed"):
+            vectors = self._call_with_retries(self.embeddings.embed_documents, batch)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(batch)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(batches[0]) if batches else []
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as executor:
+            results = list(executor.map(self._embed_batch, batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
 
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=GOOGLE_API_KEY)
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_retries(self.embeddings.embed_query, text)
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._stats)
+        if latencies:
+            stats["latency_seconds"] = {
+                "count": len(latencies),
+                "mean": sum(latencies) / len(latencies),
+                "p50": latencies[int(0.50 * (len(latencies) - 1))],
+                "p95": latencies[int(0.95 * (len(latencies) - 1))],
+                "max": latencies[-1],
+            }
+        return stats
+
+
+embeddings = model_backends.LazyEmbeddings()
+batched_embeddings = BatchedEmbeddings(embeddings)
+query_embeddings = embedding_cache.MemoizedQueryEmbeddings(embeddings)
 
 CHROMA_DB_DIR = "backend/chroma_db"
 os.makedirs(CHROMA_DB_DIR, exist_ok=True)
 
-def process_documents_and_create_vector_store(documents: List[Document], document_id: int):
-    logging.info(f"Processing {len(documents)} documents for document ID: {document_id}")
+# "per_document" keeps one Chroma directory per PDF; "shared" stores every chunk in a single
+# collection tagged with document_id/page metadata and filters on those fields at query time.
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "per_document")
+SHARED_COLLECTION_NAME = "pdf_chunks"
+SHARED_COLLECTION_DIR = os.path.join(CHROMA_DB_DIR, "shared")
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client():
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            import chromadb
+            _shared_client = chromadb.PersistentClient(path=SHARED_COLLECTION_DIR)
+        return _shared_client
+
+# Every (re)index is built as a new version beside the live one and published by atomically replacing a
+# small pointer file, so queries keep using the previous version until the new one is complete.
+# Documents indexed before versioning have no pointer and live in the unversioned location.
+INDEX_SWAP_GRACE_SECONDS = float(os.getenv("INDEX_SWAP_GRACE_SECONDS", "30"))
+
+def _index_version_path(document_id: int) -> str:
+    return os.path.join(CHROMA_DB_DIR, f"pdf_collection_{document_id}.version")
+
+def get_index_version(document_id: int) -> Optional[str]:
+    try:
+        with open(_index_version_path(document_id), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Cached answers are only served while the index version they were generated from is live.
+answer_cache.set_index_version_source(get_index_version)
+
+def _publish_index_version(document_id: int, version: str):
+    path = _index_version_path(document_id)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(temporary_path, path)
+
+def _document_persist_directory(document_id: int, version: Optional[str] = None) -> str:
+    directory = os.path.join(CHROMA_DB_DIR, f"pdf_collection_{document_id}")
+    return f"{directory}_v{version}" if version else directory
+
+def _document_filter(document_id: int, version: Optional[str], **conditions) -> Optional[dict]:
+    clauses = []
+    if VECTOR_STORE_MODE == "shared":
+        clauses.append({"document_id": document_id})
+        if version is not None:
+            clauses.append({"index_version": version})
+    clauses.extend({key: value} for key, value in conditions.items())
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _open_vectorstore_version(document_id: int, embedding_function, version: Optional[str]) -> "Chroma":
+    from langchain_community.vectorstores import Chroma
+    if VECTOR_STORE_MODE == "shared":
+        return Chroma(
+            client=get_shared_client(),
+            collection_name=SHARED_COLLECTION_NAME,
+            embedding_function=embedding_function
+        )
+    return Chroma(
+        persist_directory=_document_persist_directory(document_id, version),
+        embedding_function=embedding_function,
+        collection_name=f"pdf_collection_{document_id}"
+    )
+
+def document_has_vectors(document_id: int) -> bool:
+    version = get_index_version(document_id)
+    if VECTOR_STORE_MODE == "shared":
+        collection = get_shared_client().get_or_create_collection(SHARED_COLLECTION_NAME)
+        return bool(collection.get(where=_document_filter(document_id, version), limit=1, include=[])["ids"])
+    persist_directory = _document_persist_directory(document_id, version)
+    return os.path.exists(persist_directory) and bool(os.listdir(persist_directory))
+
+def _discard_index_version(document_id: int, version: Optional[str], chunk_ids: Optional[List[str]] = None):
+    if VECTOR_STORE_MODE == "shared":
+        collection = get_shared_client().get_or_create_collection(SHARED_COLLECTION_NAME)
+        if chunk_ids is not None:
+            if chunk_ids:
+                collection.delete(ids=chunk_ids)
+        elif version is not None:
+            collection.delete(where=_document_filter(document_id, version))
+        return
+    persist_directory = _document_persist_directory(document_id, version)
+    if os.path.exists(persist_directory):
+        logging.info(f"Removing vector store: {persist_directory}")
+        shutil.rmtree(persist_directory, ignore_errors=True)
+
+def retriever_search_kwargs(document_id: int, k: int = 4, version: Optional[str] = None) -> dict:
+    if VECTOR_STORE_MODE == "shared":
+        return {"k": k, "filter": _document_filter(document_id, version)}
+    return {"k": k}
+
+# "vector" uses Chroma only, "hybrid" fuses Chroma and BM25 rankings, "lexical" uses BM25 only and
+# never embeds the question. Documents indexed before BM25 existed fall back to vector retrieval.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = (doc.metadata.get("document_id"), doc.metadata.get("page"), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+    ranked_keys = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked_keys]
+
+class HybridRetriever(BaseRetriever):
+    vector_retriever: Optional[Any] = None
+    lexical_index: Optional[Any] = None
+    k: int = RETRIEVAL_K
+    candidates: int = RETRIEVAL_CANDIDATES
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        rankings = []
+        if self.lexical_index is not None:
+            rankings.append([doc for doc, _ in self.lexical_index.search(query, self.candidates)])
+        if self.vector_retriever is not None:
+            rankings.append(self.vector_retriever.invoke(query))
+        if len(rankings) == 1:
+            return rankings[0][:self.k]
+        return reciprocal_rank_fusion(rankings, self.k)
+
+def build_retriever(document_id: int, version: Optional[str]) -> BaseRetriever:
+    with metrics.span("vector_store_open"):
+        return _build_retriever(document_id, version)
+
+def _build_retriever(document_id: int, version: Optional[str]) -> BaseRetriever:
+    index = lexical_index.load_document_index(document_id) if RETRIEVAL_MODE in ("hybrid", "lexical") else None
+    if index is None and RETRIEVAL_MODE != "vector":
+        logging.info(f"No lexical index for document ID {document_id}; using vector retrieval only.")
+    if index is not None and RETRIEVAL_MODE == "lexical":
+        return HybridRetriever(lexical_index=index)
+
+    vectorstore = _open_vectorstore_version(document_id, query_embeddings, version)
+    if index is None:
+        return vectorstore.as_retriever(search_kwargs=retriever_search_kwargs(document_id, RETRIEVAL_K, version))
+    vector_retriever = vectorstore.as_retriever(search_kwargs=retriever_search_kwargs(document_id, RETRIEVAL_CANDIDATES, version))
+    return HybridRetriever(vector_retriever=vector_retriever, lexical_index=index)
+
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "256"))
+QA_CHAIN_CACHE_SIZE = int(os.getenv("QA_CHAIN_CACHE_SIZE", "32"))
+# Retrievers opened for cross-document search only; kept apart so an "all" query cannot evict the QA chains.
+RETRIEVER_CACHE_SIZE = int(os.getenv("RETRIEVER_CACHE_SIZE", "64"))
+
+class _DocumentLRU:
+    """Per-document LRU of opened index objects, most recently used last.
+
+    put() re-checks the live index version under the lock: a swap that published a new version while
+    the value was being built has already run its invalidation, so caching the value then would keep
+    serving (and pinning) the retired version.
+    """
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale": 0}
+
+    def __contains__(self, document_id: int) -> bool:
+        with self._lock:
+            return document_id in self._entries
+
+    def get(self, document_id: int, count: bool = True):
+        with self._lock:
+            value = self._entries.get(document_id)
+            if value is not None:
+                self._entries.move_to_end(document_id)
+            if count:
+                self._stats["hits" if value is not None else "misses"] += 1
+            return value
+
+    def put(self, document_id: int, version: Optional[str], value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if get_index_version(document_id) != version:
+                self._stats["stale"] += 1
+                logging.info(f"Not caching {self.name} for document ID {document_id}: index version {version} was replaced while it was built")
+                return
+            self._entries[document_id] = value
+            self._entries.move_to_end(document_id)
+            while len(self._entries) > self.max_size:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+                logging.info(f"Evicted cached {self.name} for document ID: {evicted_id}")
+
+    def invalidate(self, document_id: int):
+        with self._lock:
+            if self._entries.pop(document_id, None) is not None:
+                self._stats["invalidations"] += 1
+                logging.info(f"Invalidated cached {self.name} for document ID: {document_id}")
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_size": self.max_size}
+
+# (retriever, QA chain) per document; the retriever holds the opened Chroma collection and/or BM25 index.
+_qa_chain_cache = _DocumentLRU("QA chain", QA_CHAIN_CACHE_SIZE)
+_retriever_cache = _DocumentLRU("retriever", RETRIEVER_CACHE_SIZE)
+
+def invalidate_document_cache(document_id: int):
+    answer_cache.answer_cache.invalidate_document(document_id)
+    _qa_chain_cache.invalidate(document_id)
+    _retriever_cache.invalidate(document_id)
+
+def embed_question(question: str):
+    return query_embeddings.embed_query(question)
+
+def embed_questions(questions: List[str]):
+    return query_embeddings.embed_queries(questions)
+
+def get_embedding_stats():
+    return batched_embeddings.stats()
+
+def preload_modules():
+    """Imports the modules the ingest and question paths load lazily, so warm-up can pay for them off the request path."""
+    import chromadb  # noqa: F401
+    from langchain.chains import RetrievalQA  # noqa: F401
+    from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: F401
+    from langchain_community.vectorstores import Chroma  # noqa: F401
+
+def get_cache_stats():
+    return {"qa_chains": _qa_chain_cache.stats(), "retrievers": _retriever_cache.stats(), "answers": answer_cache.answer_cache.stats()}
+
+def page_content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class _PreviousIndex:
+    """Read access to the live index version, used to copy vectors of pages whose content is unchanged."""
+
+    def __init__(self, document_id: int, version: Optional[str]):
+        self.document_id = document_id
+        self.version = version
+        self.collection = None
+        self.chunk_ids: List[str] = []
+        self.page_hashes = set()
+        if VECTOR_STORE_MODE != "shared" and not os.path.isdir(_document_persist_directory(document_id, version)):
+            return
+        self.collection = _open_vectorstore_version(document_id, query_embeddings, version)._collection
+        existing = self.collection.get(where=_document_filter(document_id, version), include=["metadatas"])
+        self.chunk_ids = existing["ids"]
+        self.page_hashes = {metadata.get("page_hash") for metadata in existing["metadatas"] if metadata and metadata.get("page_hash")}
+
+    def chunks_for_page(self, page_hash: str):
+        where = _document_filter(self.document_id, self.version, page_hash=page_hash)
+        result = self.collection.get(where=where, include=["documents", "metadatas", "embeddings"])
+        # A page hash can occur on several pages; keep one copy of its chunks, in their original order.
+        chunks = {}
+        for text, metadata, vector in zip(result["documents"], result["metadatas"], result["embeddings"]):
+            chunks.setdefault(metadata.get("chunk", 0), (text, metadata, list(vector)))
+        return [chunks[index] for index in sorted(chunks)]
+
+def process_documents_and_create_vector_store(documents: Iterable[Document], document_id: int, reuse_previous: bool = False, on_swap: Optional[Callable[[], None]] = None):
+    """Builds a new index version beside the live one and swaps it in once complete.
+
+    With reuse_previous, pages whose content hash matches a page of the live version keep their
+    stored vectors; only new or changed pages are split and embedded. on_swap publishes anything
+    staged alongside the index (the page store) as part of the swap. The old version is discarded
+    after INDEX_SWAP_GRACE_SECONDS.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    logging.info(f"Function process_documents_and_create_vector_store called for document ID: {document_id}")
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
-        length_function=len
+        length_function=len,
+        add_start_index=True
     )
-    chunked_documents = text_splitter.split_documents(documents)
-    logging.info(f"Split into {len(chunked_documents)} chunks for document ID: {document_id}")
 
-    collection_name = f"pdf_collection_{document_id}"
-    persist_directory = os.path.join(CHROMA_DB_DIR, collection_name)
-    logging.info(f"Function process_documents_and_create_vector_store called for document ID: {document_id}")
-    logging.info(f"Received {len(documents)} documents for chunking.")
+    previous_version = get_index_version(document_id)
+    previous = _PreviousIndex(document_id, previous_version)
+    version = uuid.uuid4().hex[:12]
 
-    vectorstore = Chroma.from_documents(
-        documents=chunked_documents,
-        embedding=embeddings,
-        persist_directory=persist_directory,
-        collection_name=collection_name
-    )
-    logging.info(f"ChromaDB initialized for document ID {document_id}. Attempting to persist...")
-    vectorstore.persist()
-    logging.info(f"Vector store created/updated for document ID: {document_id} at {persist_directory}")
-    return vectorstore
+    cached_embeddings = embedding_cache.CachedEmbeddings(batched_embeddings, model_backends.embedding_model_name())
+    vectorstore = _open_vectorstore_version(document_id, cached_embeddings, version)
+    staged_index_path = f"{lexical_index.index_path(document_id)}.{version}"
+    bm25_index = lexical_index.BM25IndexWriter(staged_index_path)
 
-def get_qa_chain(document_id: int):
-    collection_name = f"pdf_collection_{document_id}"
-    persist_directory = os.path.join(CHROMA_DB_DIR, collection_name)
-    logging.info(f"Checking for vector store at: {persist_directory}")
-    if not os.path.exists(persist_directory) or not os.listdir(persist_directory):
-        logging.error(f"ChromaDB directory not found or is empty for document ID {document_id}: {persist_directory}")
+    # Pages arrive as a stream; chunks are embedded and written in batches so the whole document is never held in memory.
+    page_count = 0
+    reused_pages = 0
+    chunk_count = 0
+    reused_chunks = 0
+    split_seconds = 0.0
+    batch = []
+    try:
+        for document in documents:
+            page_count += 1
+            page_hash = page_content_hash(document.page_content)
+            if reuse_previous and page_hash in previous.page_hashes:
+                reused = previous.chunks_for_page(page_hash)
+                if reused:
+                    metadatas = [
+                        dict(metadata, page=document.metadata.get("page"), index_version=version)
+                        for _, metadata, _ in reused
+                    ]
+                    vectorstore._collection.add(
+                        ids=[str(uuid.uuid4()) for _ in reused],
+                        documents=[text for text, _, _ in reused],
+                        metadatas=metadatas,
+                        embeddings=[vector for _, _, vector in reused]
+                    )
+                    for (text, _, _), metadata in zip(reused, metadatas):
+                        bm25_index.add(text, metadata)
+                    reused_pages += 1
+                    reused_chunks += len(reused)
+                    continue
+
+            split_start = time.perf_counter()
+            chunks = text_splitter.split_documents([document])
+            split_seconds += time.perf_counter() - split_start
+            for chunk_index, chunk in enumerate(chunks):
+                chunk.metadata.update(document_id=document_id, page_hash=page_hash, chunk=chunk_index, index_version=version)
+                bm25_index.add(chunk.page_content, chunk.metadata)
+            batch.extend(chunks)
+            if len(batch) >= INGEST_BATCH_CHUNKS:
+                vectorstore.add_documents(batch)
+                chunk_count += len(batch)
+                batch = []
+        if batch:
+            vectorstore.add_documents(batch)
+            chunk_count += len(batch)
+        metrics.observe_stage("split", split_seconds)
+        logging.info(f"Split {page_count} pages into {chunk_count + reused_chunks} chunks for document ID: {document_id} ({reused_pages} unchanged pages reused {reused_chunks} chunks)")
+
+        logging.info(f"ChromaDB populated for document ID {document_id}. Attempting to persist...")
+        persist_start = time.perf_counter()
+        with metrics.span("persist"):
+            if VECTOR_STORE_MODE != "shared":
+                # The shared PersistentClient writes through on its own and has no persist directory to flush.
+                vectorstore.persist()
+            bm25_index.save()
+    except BaseException:
+        logging.warning(f"Discarding incomplete index version {version} for document ID {document_id}; the live version is untouched.")
+        _discard_index_version(document_id, version)
+        bm25_index.discard()
+        if os.path.exists(staged_index_path):
+            os.remove(staged_index_path)
+        raise
+
+    with metrics.span("swap"):
+        # BM25 is replaced before the pointer, so a retriever built against the old pointer but the new
+        # BM25 file is caught by _DocumentLRU.put's version check.
+        os.replace(staged_index_path, lexical_index.index_path(document_id))
+        _publish_index_version(document_id, version)
+        if on_swap is not None:
+            on_swap()
+        invalidate_document_cache(document_id)
+    persist_seconds = time.perf_counter() - persist_start
+
+    # In-flight queries may still hold the old version, so it is removed after a grace period.
+    if previous.collection is not None:
+        cleanup = threading.Timer(INDEX_SWAP_GRACE_SECONDS, _discard_index_version, args=(document_id, previous_version, previous.chunk_ids))
+        cleanup.daemon = True
+        cleanup.start()
+
+    logging.info(f"Vector store and lexical index version {version} published for document ID: {document_id} ({VECTOR_STORE_MODE} mode)")
+    embedding_stats = cached_embeddings.stats()
+    logging.info(f"Embedding cache for document ID {document_id}: {embedding_stats['hits']} hits, {embedding_stats['misses']} misses, {embedding_stats['embedding_calls_saved']} embedding calls saved")
+    ingest_stats = {
+        "pages": page_count,
+        "chunks": chunk_count + reused_chunks,
+        "reused_pages": reused_pages,
+        "reused_chunks": reused_chunks,
+        "persist_seconds": persist_seconds,
+        "embedding_cache": embedding_stats
+    }
+    return vectorstore, ingest_stats
+
+def _require_vectors(document_id: int):
+    logging.info(f"Checking for vector store for document ID {document_id} ({VECTOR_STORE_MODE} mode)")
+    if not document_has_vectors(document_id):
+        logging.error(f"Vector store not found or is empty for document ID {document_id}")
         raise FileNotFoundError(f"Vector store not found for document ID {document_id}. Please ensure the PDF was processed correctly.")
 
-   
-    vectorstore = Chroma(
-        persist_directory=persist_directory,
-        embedding_function=embeddings,
-        collection_name=collection_name
-    )
+def get_qa_chain(document_id: int):
+    cached = _qa_chain_cache.get(document_id)
+    if cached is not None:
+        return cached[1]
 
+    _require_vectors(document_id)
+    version = get_index_version(document_id)
+    retriever = build_retriever(document_id, version)
+
+    from langchain.chains import RetrievalQA
     qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=model_backends.get_llm(),
         chain_type="stuff",
-        retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
+        retriever=retriever,
         return_source_documents=True,
         input_key="query"
     )
     logging.info(f"QA chain created for document ID: {document_id}")
-    return qa_chain
\ No newline at end of file
+    _qa_chain_cache.put(document_id, version, (retriever, qa_chain))
+    return qa_chain
+
+def get_retriever(document_id: int) -> BaseRetriever:
+    """The document's opened retriever without a QA chain: shared with its cached chain if it has one."""
+    cached = _qa_chain_cache.get(document_id, count=False)
+    if cached is not None:
+        return cached[0]
+    retriever = _retriever_cache.get(document_id)
+    if retriever is not None:
+        return retriever
+
+    _require_vectors(document_id)
+    version = get_index_version(document_id)
+    retriever = build_retriever(document_id, version)
+    _retriever_cache.put(document_id, version, retriever)
+    return retriever
+
+context_tokens = metrics.histogram(
+    "askmypdf_context_tokens",
+    "Estimated prompt context tokens per question before and after context assembly.",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+    label_names=("phase",)
+)
+
+# Pages on either side of each hit to add from the page store (0 disables expansion).
+RETRIEVAL_PAGE_WINDOW = int(os.getenv("RETRIEVAL_PAGE_WINDOW", "0"))
+
+def expand_to_neighbor_pages(source_documents: List[Document], window: int = RETRIEVAL_PAGE_WINDOW, document_id: Optional[int] = None) -> List[Document]:
+    """Appends the full text of pages within window of each hit, read from the page store, after the hits."""
+    if window <= 0:
+        return source_documents
+    expanded = list(source_documents)
+    seen = {(doc.metadata.get("document_id", document_id), doc.metadata.get("page")) for doc in source_documents}
+    for doc in source_documents:
+        hit_document_id = doc.metadata.get("document_id", document_id)
+        hit_page = doc.metadata.get("page")
+        if hit_document_id is None or hit_page is None:
+            continue
+        store = page_store.open_store(hit_document_id)
+        if store is None:
+            continue
+        for page_number in range(hit_page - window, hit_page + window + 1):
+            if (hit_document_id, page_number) in seen:
+                continue
+            seen.add((hit_document_id, page_number))
+            text = store.get_page(page_number)
+            if text and text.strip():
+                expanded.append(Document(page_content=text, metadata={"document_id": hit_document_id, "page": page_number, "expanded_from": hit_page}))
+    return expanded
+
+def assemble_context(source_documents: List[Document], document_id: Optional[int] = None):
+    """Expands hits to neighboring pages, then merges, de-duplicates and packs them for the prompt; returns (documents, size stats)."""
+    source_documents = expand_to_neighbor_pages(source_documents, document_id=document_id)
+    if context_assembly.CONTEXT_ASSEMBLY_ENABLED:
+        with metrics.span("assemble_context"):
+            documents, stats = context_assembly.assemble_context(source_documents)
+    else:
+        tokens = context_assembly.context_tokens(source_documents)
+        documents, stats = source_documents, {"chunks_before": len(source_documents), "chunks_after": len(source_documents), "tokens_before": tokens, "tokens_after": tokens}
+    if metrics.METRICS_ENABLED:
+        context_tokens.observe(stats["tokens_before"], phase="before")
+        context_tokens.observe(stats["tokens_after"], phase="after")
+    logging.info(f"Prompt context: {stats['chunks_before']} chunks / ~{stats['tokens_before']} tokens -> {stats['chunks_after']} blocks / ~{stats['tokens_after']} tokens")
+    return documents, stats
+
+def answer_question(document_id: int, question: str):
+    """Runs the "stuff" RetrievalQA steps separately so retrieval, context assembly and generation are timed on their own.
+
+    Returns (answer, retrieved documents, context size stats); the prompt gets the assembled context.
+    """
+    qa_chain = get_qa_chain(document_id)
+    with metrics.span("retrieve"):
+        source_documents = qa_chain.retriever.invoke(question)
+    context_documents, context_stats = assemble_context(source_documents, document_id)
+    with metrics.span("generate"):
+        result = qa_chain.combine_documents_chain.invoke({"input_documents": context_documents, "question": question})
+    return result.get("output_text", "No answer found."), source_documents, context_stats
+
+def stream_answer(document_id: int, question: str):
+    """Yields ("sources", documents) once retrieval finishes, ("context", size stats), then ("token", text) for each generated chunk."""
+    qa_chain = get_qa_chain(document_id)
+    with metrics.span("retrieve"):
+        source_documents = qa_chain.retriever.invoke(question)
+    yield "sources", source_documents
+    context_documents, context_stats = assemble_context(source_documents, document_id)
+    yield "context", context_stats
+
+    # Mirror the "stuff" chain: same prompt and separator, but stream the model output instead of waiting for it.
+    llm_chain = qa_chain.combine_documents_chain.llm_chain
+    context = "\n\n".join(doc.page_content for doc in context_documents)
+    prompt_value = llm_chain.prompt.format_prompt(context=context, question=question)
+    generate_start = time.perf_counter()
+    for chunk in llm_chain.llm.stream(prompt_value):
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield "token", text
+    metrics.observe_stage("generate", time.perf_counter() - generate_start)
+
+
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "4"))
+
+def _vector_search_many(vector_retriever, question_embeddings: List[List[float]]) -> List[List[Document]]:
+    # One Chroma query with several query embeddings instead of one search per question.
+    search_kwargs = vector_retriever.search_kwargs
+    result = vector_retriever.vectorstore._collection.query(
+        query_embeddings=question_embeddings,
+        n_results=search_kwargs.get("k", RETRIEVAL_K),
+        where=search_kwargs.get("filter"),
+        include=["documents", "metadatas"]
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(result["documents"], result["metadatas"])
+    ]
+
+def _retriever_parts(retriever):
+    """Splits a retriever from build_retriever into its (vector retriever, BM25 index) parts."""
+    if isinstance(retriever, HybridRetriever):
+        return retriever.vector_retriever, retriever.lexical_index
+    if hasattr(retriever, "vectorstore"):
+        return retriever, None
+    return None, None
+
+def _retrieve_many(retriever, questions: List[str], question_embeddings: Optional[List[List[float]]]) -> List[List[Document]]:
+    vector_retriever, index = _retriever_parts(retriever)
+    if vector_retriever is None and index is None:
+        return [retriever.invoke(question) for question in questions]
+
+    vector_rankings = None
+    if vector_retriever is not None:
+        if question_embeddings is None:
+            question_embeddings = embed_questions(questions)
+        vector_rankings = _vector_search_many(vector_retriever, question_embeddings)
+    if index is None:
+        return vector_rankings
+    results = []
+    for position, question in enumerate(questions):
+        lexical_ranking = [doc for doc, _ in index.search(question, retriever.candidates)]
+        if vector_rankings is None:
+            results.append(lexical_ranking[:retriever.k])
+        else:
+            results.append(reciprocal_rank_fusion([lexical_ranking, vector_rankings[position]], retriever.k))
+    return results
+
+def _generate(qa_chain, document_id: int, question: str, source_documents: List[Document]):
+    context_documents, context_stats = assemble_context(source_documents, document_id)
+    with metrics.span("generate"):
+        result = qa_chain.combine_documents_chain.invoke({"input_documents": context_documents, "question": question})
+    return result.get("output_text", "No answer found."), context_stats
+
+def answer_questions(
+    document_id: int,
+    questions: List[str],
+    question_embeddings: Optional[List[List[float]]] = None,
+    max_concurrency: int = BATCH_GENERATION_CONCURRENCY
+) -> Iterator[Tuple[int, str, List[Document], Optional[dict], Optional[str]]]:
+    """Answers several questions against one opened retriever.
+
+    Questions are embedded in one batched call and searched together; generations run concurrently
+    and (position, answer, sources, context size stats, error) is yielded as each completes.
+    """
+    qa_chain = get_qa_chain(document_id)
+    with metrics.span("retrieve"):
+        source_documents = _retrieve_many(qa_chain.retriever, questions, question_embeddings)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(questions)))) as executor:
+        futures = {
+            executor.submit(_generate, qa_chain, document_id, question, documents): position
+            for position, (question, documents) in enumerate(zip(questions, source_documents))
+        }
+        for future in as_completed(futures):
+            position = futures[future]
+            try:
+                answer, context_stats = future.result()
+            except Exception as e:
+                logging.error(f"Generation failed for question {position} of batch on document ID {document_id}: {e}")
+                yield position, "", source_documents[position], None, str(e)
+                continue
+            yield position, answer, source_documents[position], context_stats, None
+
+
+MULTI_DOCUMENT_SEARCH_WORKERS = int(os.getenv("MULTI_DOCUMENT_SEARCH_WORKERS", "8"))
+
+_search_executor = ThreadPoolExecutor(max_workers=MULTI_DOCUMENT_SEARCH_WORKERS, thread_name_prefix="search")
+_multi_document_chain = None
+
+def _get_multi_document_chain():
+    global _multi_document_chain
+    if _multi_document_chain is None:
+        from langchain.chains.question_answering import load_qa_chain
+        _multi_document_chain = load_qa_chain(model_backends.get_llm(), chain_type="stuff")
+    return _multi_document_chain
+
+def _search_document(document_id: int, question: str, question_embedding: Optional[List[float]], candidates: int):
+    """Returns (vector hits with distances, BM25 hits with scores) from one document's opened retriever."""
+    vector_retriever, index = _retriever_parts(get_retriever(document_id))
+    vector_hits = []
+    if vector_retriever is not None:
+        result = vector_retriever.vectorstore._collection.query(
+            query_embeddings=[question_embedding if question_embedding is not None else embed_question(question)],
+            n_results=candidates,
+            where=vector_retriever.search_kwargs.get("filter"),
+            include=["documents", "metadatas", "distances"]
+        )
+        vector_hits = [
+            (Document(page_content=text, metadata=dict(metadata or {}, document_id=document_id)), distance)
+            for text, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+    lexical_hits = []
+    if index is not None:
+        for doc, score in index.search(question, candidates):
+            doc.metadata["document_id"] = document_id
+            lexical_hits.append((doc, score))
+    return vector_hits, lexical_hits
+
+def retrieve_across_documents(document_ids: List[int], question: str, k: int = RETRIEVAL_K, per_document_limit: Optional[int] = None) -> List[Document]:
+    """Searches the documents in parallel and merges their candidates into one global top-k.
+
+    Vector candidates are ranked by distance and BM25 candidates by score across all documents, then
+    fused as in HybridRetriever. per_document_limit caps how many chunks one document may contribute.
+    """
+    question_embedding = embed_question(question) if RETRIEVAL_MODE != "lexical" else None
+    candidates = max(k, RETRIEVAL_CANDIDATES)
+    futures = {
+        _search_executor.submit(_search_document, document_id, question, question_embedding, candidates): document_id
+        for document_id in document_ids
+    }
+    vector_hits, lexical_hits = [], []
+    for future in as_completed(futures):
+        try:
+            document_vector_hits, document_lexical_hits = future.result()
+        except FileNotFoundError as e:
+            logging.warning(f"Skipping document ID {futures[future]} in cross-document search: {e}")
+            continue
+        vector_hits.extend(document_vector_hits)
+        lexical_hits.extend(document_lexical_hits)
+
+    rankings = []
+    if vector_hits:
+        rankings.append([doc for doc, _ in sorted(vector_hits, key=lambda hit: hit[1])])
+    if lexical_hits:
+        rankings.append([doc for doc, _ in sorted(lexical_hits, key=lambda hit: hit[1], reverse=True)])
+    if not rankings:
+        return []
+    ranked = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings, len(vector_hits) + len(lexical_hits))
+
+    selected = []
+    taken_per_document = {}
+    for doc in ranked:
+        document_id = doc.metadata["document_id"]
+        if per_document_limit and taken_per_document.get(document_id, 0) >= per_document_limit:
+            continue
+        taken_per_document[document_id] = taken_per_document.get(document_id, 0) + 1
+        selected.append(doc)
+        if len(selected) >= k:
+            break
+    return selected
+
+def answer_question_across_documents(document_ids: List[int], question: str, k: int = RETRIEVAL_K, per_document_limit: Optional[int] = None):
+    with metrics.span("retrieve"):
+        source_documents = retrieve_across_documents(document_ids, question, k, per_document_limit)
+    context_documents, context_stats = assemble_context(source_documents)
+    with metrics.span("generate"):
+        result = _get_multi_document_chain().invoke({"input_documents": context_documents, "question": question})
+    return result.get("output_text", "No answer found."), source_documents, context_stats
@@ -0,0 +1,126 @@
+# backend/page_store.py
+
+import mmap
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+PAGE_STORE_DIR = "backend/page_store"
+os.makedirs(PAGE_STORE_DIR, exist_ok=True)
+
+PAGE_STORE_CACHE_SIZE = int(os.getenv("PAGE_STORE_CACHE_SIZE", "64"))
+
+# File layout: UTF-8 page texts back to back, then page_count + 1 little-endian uint64 byte offsets
+# (page i spans offsets[i]..offsets[i + 1]), then the footer below.
+_MAGIC = b"AMPPAGE1"
+_FOOTER = struct.Struct("<QQQ8s")  # offsets position, page count, first page number, magic
+_OFFSET = struct.Struct("<Q")
+_OFFSET_PAIR = struct.Struct("<2Q")
+
+
+def store_path(document_id: int) -> str:
+    return os.path.join(PAGE_STORE_DIR, f"document_{document_id}.pages")
+
+
+class PageStoreWriter:
+    """Appends pages to a temporary file; finish() adds the offset index and commit() atomically replaces the store."""
+
+    def __init__(self, document_id: int):
+        self.document_id = document_id
+        self.path = store_path(document_id)
+        self.temporary_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self.temporary_path, "wb")
+        self._offsets = [0]
+        self._first_page = None
+        self._next_page = None
+
+    def add_page(self, page_number: int, text: str):
+        if self._first_page is None:
+            self._first_page = self._next_page = page_number
+        if page_number != self._next_page:
+            raise ValueError(f"Pages must be added in order: expected page {self._next_page}, got {page_number}.")
+        self._file.write(text.encode("utf-8"))
+        self._offsets.append(self._file.tell())
+        self._next_page += 1
+
+    def finish(self):
+        if self._file.closed:
+            return
+        offsets_position = self._file.tell()
+        for offset in self._offsets:
+            self._file.write(_OFFSET.pack(offset))
+        self._file.write(_FOOTER.pack(offsets_position, len(self._offsets) - 1, self._first_page or 1, _MAGIC))
+        self._file.close()
+
+    def commit(self):
+        self.finish()
+        os.replace(self.temporary_path, self.path)
+        invalidate(self.document_id)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+
+
+class PageStore:
+    """Read-only, memory-mapped view of one document's pages with constant-time page lookup."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets_position, self.page_count, self.first_page, magic = _FOOTER.unpack_from(self._mmap, len(self._mmap) - _FOOTER.size)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a page store.")
+
+    @property
+    def last_page(self) -> int:
+        return self.first_page + self.page_count - 1
+
+    def get_page(self, page_number: int) -> Optional[str]:
+        index = page_number - self.first_page
+        if not 0 <= index < self.page_count:
+            return None
+        start, end = _OFFSET_PAIR.unpack_from(self._mmap, self._offsets_position + index * _OFFSET.size)
+        return self._mmap[start:end].decode("utf-8")
+
+    def get_pages(self, start: int, end: int) -> List[Tuple[int, str]]:
+        start = max(start, self.first_page)
+        end = min(end, self.last_page)
+        return [(page_number, self.get_page(page_number)) for page_number in range(start, end + 1)]
+
+    def close(self):
+        self._mmap.close()
+
+
+# Open stores keyed by document_id, most recently used last. A replaced store keeps serving readers that
+# already hold it (the old file stays mapped) while new lookups open the new file.
+_open_stores = OrderedDict()
+_open_stores_lock = threading.Lock()
+
+
+def open_store(document_id: int) -> Optional[PageStore]:
+    with _open_stores_lock:
+        store = _open_stores.get(document_id)
+        if store is not None:
+            _open_stores.move_to_end(document_id)
+            return store
+    path = store_path(document_id)
+    if not os.path.exists(path):
+        return None
+    store = PageStore(path)
+    with _open_stores_lock:
+        _open_stores[document_id] = store
+        _open_stores.move_to_end(document_id)
+        while len(_open_stores) > PAGE_STORE_CACHE_SIZE:
+            _open_stores.popitem(last=False)
+    return store
+
+
+def invalidate(document_id: int):
+    with _open_stores_lock:
+        _open_stores.pop(document_id, None)
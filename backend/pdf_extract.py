@@ -0,0 +1,59 @@
+# backend/pdf_extract.py
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+import fitz
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "32"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps workers from inheriting the API server's threads and open handles.
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, str]]:
+    """Yields (page_number, text) in page order, extracting page ranges in parallel for large PDFs."""
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+        if page_count <= EXTRACT_PAGES_PER_TASK or EXTRACT_WORKERS <= 1:
+            for i, page in enumerate(doc):
+                yield i + 1, page.get_text()
+            return
+
+    ranges = [(start, min(start + EXTRACT_PAGES_PER_TASK, page_count)) for start in range(0, page_count, EXTRACT_PAGES_PER_TASK)]
+    pool = _get_pool()
+    # Only a couple of ranges per worker are in flight, so memory stays bounded by the window, not the PDF.
+    window = EXTRACT_WORKERS * 2
+    pending = deque()
+    next_range = 0
+    try:
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+                next_range += 1
+            start, future = pending.popleft()
+            for offset, page_text in enumerate(future.result()):
+                yield start + offset + 1, page_text
+    finally:
+        for _, future in pending:
+            future.cancel()
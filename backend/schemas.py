@@ -2,13 +2,16 @@
 
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Union
 
 class DocumentResponse(BaseModel):
     id: int
     filename: str
     uploaded_at: datetime
     message: str
+    status: Optional[str] = None
+    job_id: Optional[str] = None
+    deduplicated: bool = False
 
     class Config:
         from_attributes = True
@@ -25,10 +28,60 @@ class QuestionResponse(BaseModel):
     sources: List[SourceDocument] = Field(default_factory=list)
     document_id: int
     question: str
+    cached: bool = False
+    cache_tier: Optional[str] = None
+    context_tokens: Optional[Dict[str, int]] = None
 
     class Config:
         from_attributes = True
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
+class BatchAnswer(QuestionResponse):
+    index: int
+    error: Optional[str] = None
+
+class BatchQuestionResponse(BaseModel):
+    document_id: int
+    answers: List[BatchAnswer]
+
+class MultiDocumentQuestionRequest(BaseModel):
+    question: str
+    document_ids: Union[List[int], Literal["all"]] = "all"
+    k: Optional[int] = Field(default=None, ge=1, le=50)
+    per_document_limit: Optional[int] = Field(default=None, ge=1)
+
+class MultiDocumentQuestionResponse(BaseModel):
+    answer: str
+    sources: List[SourceDocument] = Field(default_factory=list)
+    document_ids: List[int]
+    question: str
+    context_tokens: Optional[Dict[str, int]] = None
+
+class PageText(BaseModel):
+    page: int
+    text: str
+
+class PageRangeResponse(BaseModel):
+    document_id: int
+    page_count: int
+    pages: List[PageText]
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    document_id: int
+    status: str
+    error: Optional[str] = None
+    timings: Dict[str, float] = Field(default_factory=dict)
+    embedding_cache: Dict[str, int] = Field(default_factory=dict)
+    pages: Optional[int] = None
+    chunks: Optional[int] = None
+    reused_pages: Optional[int] = None
+    queued_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
 class DuplicateFileResponse(BaseModel):
     message: str = "File with this name already exists."
     existing_document_id: int
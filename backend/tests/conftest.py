@@ -0,0 +1,54 @@
+# backend/tests/conftest.py
+
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app reads its settings at import time and keeps its data under paths relative to the working
+# directory, so both are pinned before any backend module is imported.
+WORKDIR = tempfile.mkdtemp(prefix="askmypdf-tests-")
+os.chdir(WORKDIR)
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    "DB_CREATE_TABLES": "true",
+    "MODEL_BACKEND": "local",
+    "FAKE_LLM_TOKEN_DELAY": "0",
+    "EMBEDDING_CACHE_PATH": os.path.join(WORKDIR, "embedding_cache.sqlite3"),
+    "EMBED_REQUESTS_PER_SECOND": "0",
+    "WARMUP_ENABLED": "false",
+})
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def make_pdf(page_texts) -> bytes:
+    import fitz
+
+    pdf = fitz.open()
+    for text in page_texts:
+        pdf.new_page().insert_text((72, 72), text)
+    return pdf.tobytes()
+
+
+def wait_for_job(client, job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("ready", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} did not finish within {timeout}s")
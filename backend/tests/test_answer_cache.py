@@ -0,0 +1,98 @@
+# backend/tests/test_answer_cache.py
+
+import answer_cache
+
+
+def make_cache(versions=None, **options):
+    versions = {} if versions is None else versions
+    return answer_cache.AnswerCache(index_version=versions.get, **options), versions
+
+
+def test_exact_tier_matches_normalized_question_and_counts_misses():
+    cache, _ = make_cache()
+    assert cache.get_exact(1, "What is the fee?") is None
+    cache.put(1, "What is the fee?", "Ten euros.", [])
+
+    assert cache.get_exact(1, "  what is   the FEE ")["answer"] == "Ten euros."
+    assert cache.get_exact(2, "What is the fee?") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["exact_misses"]) == (1, 2)
+
+
+def test_semantic_tier_uses_similarity_threshold():
+    cache, _ = make_cache(similarity_threshold=0.9)
+    cache.put(1, "What is the fee?", "Ten euros.", [], [1.0, 0.0])
+
+    assert cache.get_semantic(1, [0.99, 0.05])["answer"] == "Ten euros."
+    assert cache.get_semantic(1, [0.0, 1.0]) is None
+    assert cache.get_semantic(2, [1.0, 0.0]) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache, _ = make_cache(ttl_seconds=60)
+    cache.put(1, "q", "a", [], [1.0, 0.0])
+
+    now[0] += 59
+    assert cache.get_exact(1, "q") is not None
+    now[0] += 2
+    assert cache.get_exact(1, "q") is None
+    assert cache.get_semantic(1, [1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_document_only_drops_that_document():
+    cache, _ = make_cache()
+    cache.put(1, "q", "a1", [])
+    cache.put(2, "q", "a2", [])
+
+    cache.invalidate_document(1)
+    assert cache.get_exact(1, "q") is None
+    assert cache.get_exact(2, "q")["answer"] == "a2"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache, _ = make_cache(max_entries=2)
+    cache.put(1, "first", "a", [])
+    cache.put(1, "second", "b", [])
+    cache.get_exact(1, "first")
+    cache.put(1, "third", "c", [])
+
+    assert cache.get_exact(1, "second") is None
+    assert cache.get_exact(1, "first") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answer_from_replaced_index_version_is_not_cached_or_served():
+    cache, versions = make_cache({1: "v1"})
+    cache.put(1, "q", "from v1", [], [1.0, 0.0], "v1")
+    assert cache.get_exact(1, "q")["answer"] == "from v1"
+
+    # A re-index swaps in v2 while another question is still being answered from v1.
+    versions[1] = "v2"
+    cache.invalidate_document(1)
+    cache.put(1, "late", "from v1", [], [0.0, 1.0], "v1")
+    assert cache.get_exact(1, "late") is None
+    assert cache.get_semantic(1, [0.0, 1.0]) is None
+
+    # An entry that slipped in under the old version is rejected once the version changes.
+    versions[1] = "v1"
+    cache.put(1, "q", "from v1", [], None, "v1")
+    versions[1] = "v3"
+    assert cache.get_exact(1, "q") is None
+    assert cache.stats()["stale"] == 2
+
+
+def test_shared_cache_gets_its_version_source_from_nlp_utils():
+    import nlp_utils
+
+    assert answer_cache.answer_cache.index_version is nlp_utils.get_index_version
+
+    cache = answer_cache.AnswerCache()
+    cache.set_index_version_source({1: "v1"}.get)
+    cache.put(1, "What is the fee?", "Ten euros.", [], index_version="v0")
+    assert cache.get_exact(1, "What is the fee?") is None
+    cache.put(1, "What is the fee?", "Ten euros.", [], index_version="v1")
+    assert cache.get_exact(1, "What is the fee?")["answer"] == "Ten euros."
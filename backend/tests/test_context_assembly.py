@@ -0,0 +1,58 @@
+# backend/tests/test_context_assembly.py
+
+from langchain_core.documents import Document
+
+import context_assembly
+
+
+def words(start: int, count: int) -> str:
+    return " ".join(f"w{index}" for index in range(start, start + count))
+
+
+def chunk(text: str, page: int = 1, start_index=None) -> Document:
+    metadata = {"document_id": 1, "page": page}
+    if start_index is not None:
+        metadata["start_index"] = start_index
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_overlapping_chunks_merge_by_offset_and_keep_best_rank_metadata():
+    page = words(0, 100)
+    first, second = page[:300], page[250:500]
+    assembled, stats = context_assembly.assemble_context(
+        [chunk(second, start_index=250), chunk(first, start_index=0)], token_budget=0
+    )
+    assert [doc.page_content for doc in assembled] == [page[:500]]
+    assert assembled[0].metadata["start_index"] == 0
+    assert stats["chunks_before"] == 2 and stats["chunks_after"] == 1
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_chunks_without_offsets_merge_by_matching_text():
+    page = words(0, 60)
+    left, right = page[:200], page[170:]
+    assembled, _ = context_assembly.assemble_context([chunk(left), chunk(right)], token_budget=0)
+    assert [doc.page_content for doc in assembled] == [page]
+    assert "start_index" not in assembled[0].metadata
+
+
+def test_near_duplicates_on_other_pages_are_dropped_keeping_the_better_ranked():
+    text = words(0, 40)
+    assembled, _ = context_assembly.assemble_context(
+        [chunk(text, page=3), chunk(words(500, 40), page=1), chunk(text + " trailing", page=7)], token_budget=0
+    )
+    assert [doc.metadata["page"] for doc in assembled] == [3, 1]
+
+
+def test_packing_is_best_first_under_the_budget():
+    texts = [words((index + 1) * 1000, 80) for index in range(3)]
+    tokens = context_assembly.estimate_tokens(texts[0])
+    documents = [chunk(text, page=page) for page, text in enumerate(texts, start=1)]
+
+    assembled, stats = context_assembly.assemble_context(documents, token_budget=2 * tokens + 1)
+    assert [doc.metadata["page"] for doc in assembled] == [1, 2]
+    assert stats["tokens_after"] <= 2 * tokens + 1
+
+    # A budget smaller than the best chunk still returns that chunk, truncated to fit.
+    assembled, _ = context_assembly.assemble_context(documents, token_budget=10)
+    assert [doc.page_content for doc in assembled] == [texts[0][:10 * context_assembly.CHARS_PER_TOKEN]]
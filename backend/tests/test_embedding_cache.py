@@ -0,0 +1,35 @@
+# backend/tests/test_embedding_cache.py
+
+import os
+
+import embedding_cache
+
+VECTOR_BYTES = 4 * 4  # four float32 values
+
+
+def test_store_tracks_size_and_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_EVICT_BATCH", 2)
+    path = os.path.join(tmp_path, "cache.sqlite3")
+    store = embedding_cache.EmbeddingCacheStore(path, max_bytes=5 * VECTOR_BYTES)
+    clock = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+
+    for index in range(5):
+        clock[0] += 1
+        store.put_many("model", {f"h{index}": [float(index)] * 4})
+    assert store.total_bytes == 5 * VECTOR_BYTES
+
+    # Replacing an entry does not change the total; reading one makes it recently used.
+    store.put_many("model", {"h0": [9.0] * 4})
+    clock[0] += 1
+    store.get_many("model", ["h1"])
+    assert store.total_bytes == 5 * VECTOR_BYTES
+
+    clock[0] += 1
+    store.put_many("model", {"h5": [5.0] * 4})
+    # Over budget: trimmed to 90% (4 vectors), oldest first: h2 and h3 go, h1 and the rewritten h0 stay.
+    assert store.total_bytes == 4 * VECTOR_BYTES
+    assert set(store.get_many("model", [f"h{index}" for index in range(6)])) == {"h0", "h1", "h4", "h5"}
+
+    reopened = embedding_cache.EmbeddingCacheStore(path, max_bytes=5 * VECTOR_BYTES)
+    assert reopened.total_bytes == 4 * VECTOR_BYTES
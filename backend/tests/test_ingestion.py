@@ -0,0 +1,155 @@
+# backend/tests/test_ingestion.py
+
+import database
+import ingestion
+import lexical_index
+import models
+import nlp_utils
+import page_store
+
+from tests.conftest import make_pdf, wait_for_job
+
+
+def stored_document(document_id: int) -> models.Document:
+    db = database.SessionLocal()
+    try:
+        return db.get(models.Document, document_id)
+    finally:
+        db.close()
+
+
+def overwrite(client, filename: str, document_id: int, content: bytes) -> dict:
+    response = client.post(
+        "/upload-pdf/",
+        files={"file": (filename, content, "application/pdf")},
+        data={"action": "overwrite", "existing_document_id": str(document_id)}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def lexical_hits(document_id: int, query: str):
+    return [doc.page_content for doc, _ in lexical_index.load_document_index(document_id).search(query, 4)]
+
+
+def test_failed_overwrite_keeps_previous_hash_and_retry_reindexes(client, monkeypatch):
+    original = make_pdf(["alpha clause one", "beta clause two"])
+    uploaded = client.post("/upload-pdf/", files={"file": ("failed_overwrite.pdf", original, "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+    document_id = uploaded["id"]
+    original_hash = stored_document(document_id).content_hash
+    assert original_hash is not None
+
+    def embedding_provider_down(texts):
+        raise RuntimeError("embedding provider unavailable")
+
+    changed = make_pdf(["alpha clause one", "gamma replacement clause"])
+    monkeypatch.setattr(nlp_utils.batched_embeddings, "embed_documents", embedding_provider_down)
+    failed = overwrite(client, "failed_overwrite.pdf", document_id, changed)
+    assert wait_for_job(client, failed["job_id"])["status"] == "failed"
+
+    document = stored_document(document_id)
+    assert document.status == "ready"
+    assert document.content_hash == original_hash
+    assert not any("gamma" in text for text in lexical_hits(document_id, "gamma replacement"))
+    assert "beta" in page_store.open_store(document_id).get_page(2)
+
+    monkeypatch.undo()
+    retried = overwrite(client, "failed_overwrite.pdf", document_id, changed)
+    assert not retried["deduplicated"]
+    assert wait_for_job(client, retried["job_id"])["status"] == "ready"
+    assert stored_document(document_id).content_hash != original_hash
+    assert any("gamma" in text for text in lexical_hits(document_id, "gamma replacement"))
+    assert "gamma" in page_store.open_store(document_id).get_page(2)
+
+
+def test_restart_recovery_fails_orphaned_document_and_allows_overwrite(client):
+    db = database.SessionLocal()
+    try:
+        orphan = models.Document(filename="orphaned.pdf", status=ingestion.STATUS_EMBEDDING)
+        db.add(orphan)
+        db.commit()
+        document_id = orphan.id
+    finally:
+        db.close()
+
+    ingestion.recover_interrupted_documents()
+    assert stored_document(document_id).status == ingestion.STATUS_FAILED
+
+    retried = overwrite(client, "orphaned.pdf", document_id, make_pdf(["recovered page"]))
+    assert wait_for_job(client, retried["job_id"])["status"] == "ready"
+    assert stored_document(document_id).status == ingestion.STATUS_READY
+
+
+def test_finished_jobs_are_pruned_by_age_and_count(monkeypatch):
+    monkeypatch.setattr(ingestion, "JOB_RETENTION_SECONDS", 60)
+    monkeypatch.setattr(ingestion, "JOB_HISTORY_SIZE", 3)
+    jobs = {
+        "expired": {"finished_at": 0.0},
+        "old": {"finished_at": 950.0},
+        "recent": {"finished_at": 990.0},
+        "newest": {"finished_at": 995.0},
+        "running": {"finished_at": None},
+    }
+    monkeypatch.setattr(ingestion, "_jobs", dict(jobs))
+    with ingestion._jobs_lock:
+        ingestion._prune_jobs_locked(1000.0)
+    assert set(ingestion._jobs) == {"recent", "newest", "running"}
+
+
+def test_staging_failure_finishes_the_job_and_frees_the_document(client, monkeypatch):
+    uploaded = client.post("/upload-pdf/", files={"file": ("staging_failure.pdf", make_pdf(["first"]), "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+    document_id = uploaded["id"]
+
+    def page_store_unwritable(document_id):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(page_store, "PageStoreWriter", page_store_unwritable)
+    failed = overwrite(client, "staging_failure.pdf", document_id, make_pdf(["second"]))
+    job = wait_for_job(client, failed["job_id"])
+    assert job["status"] == "failed"
+    assert "No space left" in job["error"]
+    assert ingestion.get_active_job_id(document_id) is None
+
+    monkeypatch.undo()
+    retried = overwrite(client, "staging_failure.pdf", document_id, make_pdf(["second"]))
+    assert wait_for_job(client, retried["job_id"])["status"] == "ready"
+
+
+def test_overwrite_reserves_the_document_until_its_job_is_queued(client):
+    content = make_pdf(["reserved page"])
+    uploaded = client.post("/upload-pdf/", files={"file": ("reserved.pdf", content, "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+    document_id = uploaded["id"]
+
+    # A concurrent overwrite holds the reservation between its check and submit_job.
+    held = ingestion.reserve_document(document_id)
+    response = client.post(
+        "/upload-pdf/",
+        files={"file": ("reserved.pdf", make_pdf(["other page"]), "application/pdf")},
+        data={"action": "overwrite", "existing_document_id": str(document_id)}
+    )
+    assert response.status_code == 409
+    ingestion.release_document(document_id, held)
+
+    # Identical content returns early; its reservation is given back rather than leaked.
+    assert overwrite(client, "reserved.pdf", document_id, content)["deduplicated"]
+    assert ingestion.get_active_job_id(document_id) is None
+    changed = overwrite(client, "reserved.pdf", document_id, make_pdf(["other page"]))
+    assert wait_for_job(client, changed["job_id"])["status"] == "ready"
+    assert ingestion.get_active_job_id(document_id) is None
+
+
+def test_identical_upload_is_deduplicated_unless_new_is_requested(client):
+    content = make_pdf(["identical bytes"])
+    uploaded = client.post("/upload-pdf/", files={"file": ("identical.pdf", content, "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+
+    reused = client.post("/upload-pdf/", files={"file": ("identical_copy.pdf", content, "application/pdf")}).json()
+    assert reused["deduplicated"] and reused["id"] == uploaded["id"] and reused["job_id"] is None
+
+    created = client.post("/upload-pdf/", files={"file": ("identical.pdf", content, "application/pdf")}, data={"action": "new"}).json()
+    assert not created["deduplicated"]
+    assert created["id"] != uploaded["id"] and created["filename"] != "identical.pdf"
+    assert wait_for_job(client, created["job_id"])["status"] == "ready"
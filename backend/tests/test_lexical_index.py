@@ -0,0 +1,55 @@
+# backend/tests/test_lexical_index.py
+
+import os
+
+from langchain_core.documents import Document
+
+import lexical_index
+import nlp_utils
+
+
+def build_index(path, texts):
+    writer = lexical_index.BM25IndexWriter(path)
+    for number, text in enumerate(texts, start=1):
+        writer.add(text, {"page": number, "note": "ünïcode"})
+    writer.save()
+    return lexical_index.BM25Index(path)
+
+
+def test_bm25_ranks_exact_terms_and_round_trips_chunks(tmp_path):
+    path = os.path.join(tmp_path, "document.bm25")
+    index = build_index(path, [
+        "General payment terms apply to every invoice.",
+        "Clause ID-42 limits liability for late delivery.",
+        "Liability is unlimited for gross negligence; see clause ID-7.",
+        "",
+    ])
+
+    assert len(index) == 4
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    hits = index.search("ID-42 liability", k=3)
+    assert [doc.metadata["page"] for doc, _ in hits] == [2, 3]
+    assert hits[0][1] > hits[1][1]
+    assert hits[0][0].page_content == "Clause ID-42 limits liability for late delivery."
+    assert hits[0][0].metadata == {"page": 2, "note": "ünïcode"}
+    assert index.search("warranty") == []
+
+
+def test_empty_and_discarded_indexes(tmp_path):
+    empty = build_index(os.path.join(tmp_path, "empty.bm25"), [])
+    assert len(empty) == 0
+    assert empty.search("anything") == []
+
+    writer = lexical_index.BM25IndexWriter(os.path.join(tmp_path, "discarded.bm25"))
+    writer.add("never published", {"page": 1})
+    writer.discard()
+    assert os.listdir(tmp_path) == ["empty.bm25"]
+
+
+def test_reciprocal_rank_fusion_prefers_chunks_ranked_by_both():
+    a, b, c, d = (Document(page_content=text, metadata={"page": 1}) for text in "abcd")
+    lexical = [a, b, c]
+    vector = [c, d, b]
+    # b and c appear in both rankings; c's ranks (3rd, 1st) beat b's (2nd, 3rd).
+    assert [doc.page_content for doc in nlp_utils.reciprocal_rank_fusion([lexical, vector], k=4)] == ["c", "b", "a", "d"]
+    assert [doc.page_content for doc in nlp_utils.reciprocal_rank_fusion([lexical, vector], k=2)] == ["c", "b"]
@@ -0,0 +1,33 @@
+# backend/tests/test_migrate_database.py
+
+import os
+
+from sqlalchemy import create_engine, inspect, text
+
+import migrate_database
+
+
+def test_migration_adds_new_document_columns_to_an_old_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}")
+    with engine.begin() as connection:
+        # The documents table as shipped before ingestion jobs, deduplication and warm-up.
+        connection.execute(text(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY, filename VARCHAR NOT NULL UNIQUE, uploaded_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO documents (filename) VALUES ('contract.pdf')"))
+
+    planned = migrate_database.migrate(engine, dry_run=True)
+    assert len(planned) == len(migrate_database.pending_statements(engine))
+    assert any("ADD COLUMN status VARCHAR(20) DEFAULT 'ready' NOT NULL" in statement for statement in planned)
+
+    migrate_database.migrate(engine)
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("documents")}
+    assert {"status", "content_hash", "size_bytes", "last_queried_at"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("documents")}
+    assert {"ix_documents_content_hash", "ix_documents_last_queried_at"} <= indexes
+    assert "feedback" in inspector.get_table_names()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT status FROM documents")).scalar_one() == "ready"
+
+    assert migrate_database.pending_statements(engine) == []
@@ -0,0 +1,31 @@
+# backend/tests/test_multi_document.py
+
+import main
+import nlp_utils
+
+from tests.conftest import make_pdf, wait_for_job
+
+
+def upload(client, filename: str, page_texts) -> int:
+    response = client.post("/upload-pdf/", files={"file": (filename, make_pdf(page_texts), "application/pdf")}).json()
+    assert wait_for_job(client, response["job_id"])["status"] == "ready"
+    return response["id"]
+
+
+def test_cross_document_search_uses_retrievers_without_building_chains(client, monkeypatch):
+    first = upload(client, "multi_a.pdf", ["payment terms of the contract"])
+    second = upload(client, "multi_b.pdf", ["amendment to the payment terms"])
+    for document_id in (first, second):
+        nlp_utils.invalidate_document_cache(document_id)
+
+    response = client.post("/ask-question-multi/", json={"question": "payment terms", "document_ids": [first, second]})
+    assert response.status_code == 200, response.text
+    for document_id in (first, second):
+        assert document_id not in nlp_utils._qa_chain_cache
+        assert document_id in nlp_utils._retriever_cache
+
+    monkeypatch.setattr(main, "MULTI_DOCUMENT_MAX_DOCUMENTS", 1)
+    assert client.post("/ask-question-multi/", json={"question": "payment terms", "document_ids": [first, second]}).status_code == 400
+    response = client.post("/ask-question-multi/", json={"question": "payment terms", "document_ids": "all"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()["document_ids"]) == 1
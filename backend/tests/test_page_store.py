@@ -0,0 +1,61 @@
+# backend/tests/test_page_store.py
+
+import os
+
+import pytest
+
+import page_store
+
+# Far from the ids the ingestion tests create, whose stores share the module-level cache.
+DOCUMENT_ID = 92001
+
+
+def write_store(document_id: int, pages, first_page: int = 1):
+    writer = page_store.PageStoreWriter(document_id)
+    for page_number, text in enumerate(pages, start=first_page):
+        writer.add_page(page_number, text)
+    writer.commit()
+
+
+def test_pages_round_trip_through_the_mapped_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_store, "PAGE_STORE_DIR", str(tmp_path))
+    write_store(DOCUMENT_ID, ["first page", "", "dritte Seite — ünïcode ✓"], first_page=3)
+
+    store = page_store.open_store(DOCUMENT_ID)
+    assert (store.first_page, store.last_page, store.page_count) == (3, 5, 3)
+    assert store.get_page(3) == "first page"
+    assert store.get_page(4) == ""
+    assert store.get_page(5) == "dritte Seite — ünïcode ✓"
+    assert store.get_page(2) is None and store.get_page(6) is None
+    assert store.get_pages(1, 4) == [(3, "first page"), (4, "")]
+    assert page_store.open_store(DOCUMENT_ID) is store
+    assert page_store.open_store(DOCUMENT_ID + 1) is None
+    assert os.listdir(tmp_path) == [f"document_{DOCUMENT_ID}.pages"]
+    page_store.invalidate(DOCUMENT_ID)
+
+
+def test_commit_replaces_the_store_and_discard_leaves_it_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_store, "PAGE_STORE_DIR", str(tmp_path))
+    write_store(DOCUMENT_ID, ["old"])
+    old_store = page_store.open_store(DOCUMENT_ID)
+
+    writer = page_store.PageStoreWriter(DOCUMENT_ID)
+    writer.add_page(1, "abandoned")
+    writer.discard()
+    assert page_store.open_store(DOCUMENT_ID).get_page(1) == "old"
+
+    write_store(DOCUMENT_ID, ["new", "pages"])
+    assert page_store.open_store(DOCUMENT_ID).get_pages(1, 2) == [(1, "new"), (2, "pages")]
+    # Readers that opened the old store before the swap keep reading it.
+    assert old_store.get_page(1) == "old"
+    assert os.listdir(tmp_path) == [f"document_{DOCUMENT_ID}.pages"]
+    page_store.invalidate(DOCUMENT_ID)
+
+
+def test_pages_must_be_added_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_store, "PAGE_STORE_DIR", str(tmp_path))
+    writer = page_store.PageStoreWriter(DOCUMENT_ID)
+    writer.add_page(1, "one")
+    with pytest.raises(ValueError):
+        writer.add_page(3, "three")
+    writer.discard()
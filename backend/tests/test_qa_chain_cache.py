@@ -0,0 +1,28 @@
+# backend/tests/test_qa_chain_cache.py
+
+import nlp_utils
+
+
+def test_chain_built_across_an_index_swap_is_not_cached(monkeypatch):
+    document_id = 90001
+    nlp_utils._publish_index_version(document_id, "v1")
+    built_for = []
+
+    def build_during_swap(document_id, version):
+        built_for.append(version)
+        if len(built_for) == 1:
+            # A re-index publishes v2 (and invalidates the cache) while the v1 retriever is being opened.
+            nlp_utils._publish_index_version(document_id, "v2")
+            nlp_utils.invalidate_document_cache(document_id)
+        return nlp_utils.HybridRetriever()
+
+    monkeypatch.setattr(nlp_utils, "document_has_vectors", lambda document_id: True)
+    monkeypatch.setattr(nlp_utils, "build_retriever", build_during_swap)
+
+    nlp_utils.get_qa_chain(document_id)
+    assert document_id not in nlp_utils._qa_chain_cache
+
+    nlp_utils.get_qa_chain(document_id)
+    assert built_for == ["v1", "v2"]
+    assert document_id in nlp_utils._qa_chain_cache
+    nlp_utils.invalidate_document_cache(document_id)
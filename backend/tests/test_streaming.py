@@ -0,0 +1,78 @@
+# backend/tests/test_streaming.py
+
+import json
+
+import answer_cache
+import database
+import ingestion
+import models
+import nlp_utils
+
+from tests.conftest import make_pdf, wait_for_job
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def ask_stream(client, document_id: int, question: str):
+    response = client.post(f"/ask-question-stream/{document_id}", json={"question": question})
+    return response, sse_events(response.text) if response.status_code == 200 else None
+
+
+def test_stream_sends_sources_then_tokens_then_done_matching_the_plain_answer(client):
+    uploaded = client.post("/upload-pdf/", files={"file": ("streamed.pdf", make_pdf(["renewal notice is ninety days"]), "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+    document_id = uploaded["id"]
+    question = "How long is the renewal notice?"
+
+    response, events = ask_stream(client, document_id, question)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert len(kinds) > 3 and set(kinds[1:-1]) == {"token"}
+    assert events[0][1]["sources"]
+    streamed = "".join(data["token"] for kind, data in events if kind == "token")
+    done = events[-1][1]
+    assert done["answer"] == streamed and done["cached"] is False
+
+    # Compare with a freshly generated non-streaming answer, not the one the stream just cached.
+    answer_cache.answer_cache.invalidate_document(document_id)
+    plain = client.post(f"/ask-question/{document_id}", json={"question": question}).json()
+    assert plain["cached"] is False
+    assert plain["answer"] == streamed
+
+
+def test_stream_rejects_unknown_and_unready_documents_up_front(client):
+    response, _ = ask_stream(client, 987654, "Anything?")
+    assert response.status_code == 404
+
+    db = database.SessionLocal()
+    try:
+        pending = models.Document(filename="still_embedding.pdf", status=ingestion.STATUS_EMBEDDING)
+        db.add(pending)
+        db.commit()
+        document_id = pending.id
+    finally:
+        db.close()
+    response, _ = ask_stream(client, document_id, "Anything?")
+    assert response.status_code == 409
+
+
+def test_stream_failure_ends_with_an_error_event(client, monkeypatch):
+    uploaded = client.post("/upload-pdf/", files={"file": ("stream_failure.pdf", make_pdf(["some page"]), "application/pdf")}).json()
+    assert wait_for_job(client, uploaded["job_id"])["status"] == "ready"
+
+    def model_unavailable(document_id, question):
+        raise RuntimeError("model unavailable")
+        yield
+
+    monkeypatch.setattr(nlp_utils, "stream_answer", model_unavailable)
+    response, events = ask_stream(client, uploaded["id"], "Will this fail?")
+    assert response.status_code == 200
+    assert [kind for kind, _ in events] == ["error"]
+    assert "model unavailable" in events[0][1]["detail"]
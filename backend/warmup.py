@@ -0,0 +1,94 @@
+# backend/warmup.py
+
+import logging
+import os
+import threading
+import time
+
+import database
+import ingestion
+import model_backends
+import models
+import nlp_utils
+import page_store
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+WARMUP_DOCUMENTS = int(os.getenv("WARMUP_DOCUMENTS", "5"))
+
+STATUS_PENDING = "pending"
+STATUS_WARMING = "warming"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_state = {
+    "status": STATUS_PENDING,
+    "error": None,
+    "documents": [],
+    "document_errors": {},
+    "started_at": None,
+    "finished_at": None,
+    "seconds": None,
+}
+_state_lock = threading.Lock()
+
+
+def get_state() -> dict:
+    with _state_lock:
+        return dict(_state, documents=list(_state["documents"]), document_errors=dict(_state["document_errors"]))
+
+
+def _update(**fields):
+    with _state_lock:
+        _state.update(fields)
+
+
+def recently_queried_document_ids(limit: int):
+    db = database.SessionLocal()
+    try:
+        rows = (
+            db.query(models.Document.id)
+            .filter(models.Document.status == ingestion.STATUS_READY, models.Document.last_queried_at.isnot(None))
+            .order_by(models.Document.last_queried_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+
+def run_warmup():
+    """Imports the lazily loaded modules, creates the model clients and opens the N most recently queried indexes."""
+    started = time.perf_counter()
+    _update(status=STATUS_WARMING, started_at=time.time())
+    try:
+        nlp_utils.preload_modules()
+        # Creates the embedding client if it is still the lazy wrapper.
+        getattr(nlp_utils.embeddings, "wrapped", None)
+        model_backends.get_llm()
+        document_ids = recently_queried_document_ids(WARMUP_DOCUMENTS) if WARMUP_DOCUMENTS > 0 else []
+        for document_id in document_ids:
+            try:
+                nlp_utils.get_qa_chain(document_id)
+                page_store.open_store(document_id)
+            except Exception as e:
+                logging.warning(f"Warm-up could not preload document ID {document_id}: {e}")
+                with _state_lock:
+                    _state["document_errors"][str(document_id)] = str(e)
+                continue
+            with _state_lock:
+                _state["documents"].append(document_id)
+    except Exception as e:
+        logging.error(f"Warm-up failed: {e}", exc_info=True)
+        _update(status=STATUS_FAILED, error=str(e), finished_at=time.time(), seconds=time.perf_counter() - started)
+        return
+    seconds = time.perf_counter() - started
+    _update(status=STATUS_READY, finished_at=time.time(), seconds=seconds)
+    logging.info(f"Warm-up finished in {seconds:.2f}s; preloaded document IDs {get_state()['documents']}")
+
+
+def start():
+    if not WARMUP_ENABLED:
+        _update(status=STATUS_READY, started_at=time.time(), finished_at=time.time(), seconds=0.0)
+        return
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
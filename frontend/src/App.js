@@ -5,6 +5,7 @@ import DuplicateFileModal from "./components/DuplicateFileModal";
 import ChatArea from "./components/ChatArea";
 import MessageInput from "./components/MessageInput";
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || "http://127.0.0.1:8000"
+const JOB_POLL_INTERVAL_MS = 1000
 
 function App() {
   const [selectedFile, setSelectedFile] = useState(null)
@@ -33,6 +34,25 @@ function App() {
     }
   }
 
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`)
+      if (!response.ok) {
+        const errorData = await response.json()
+        throw new Error(errorData.detail || "Could not fetch processing status.")
+      }
+      const job = await response.json()
+      if (job.status === "ready") {
+        return job
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "PDF processing failed.")
+      }
+      setUploadMessage(`Processing PDF (${job.status})...`)
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+    }
+  }
+
   const handleUpload = async () => {
     if (!selectedFile) {
       setUploadMessage("Please select a file first!")
@@ -65,13 +85,14 @@ function App() {
       }
 
       const data = await response.json();
+      if (data.job_id) {
+        await waitForJob(data.job_id);
+      }
       alert(`File uploaded! Document ID: ${data.id}`);
       setDocumentId(data.id);
       setDocumentName(data.filename);
-      setUploadMessage(data.message || "PDF uploaded and processed!");
-      if (data.message) {
-        setTimeout(() => setUploadMessage(""), 3000);
-      }
+      setUploadMessage("PDF uploaded and processed!");
+      setTimeout(() => setUploadMessage(""), 3000);
 
     } catch (err) {
       setError(`Upload Error: ${err.message}`)
@@ -102,8 +123,13 @@ function App() {
     setLoading(true)
     setError("")
 
+    const aiMessageId = messageId + 1
+    const updateAiMessage = (changes) => {
+      setConversation((prev) => prev.map((msg) => (msg.id === aiMessageId ? { ...msg, ...changes(msg) } : msg)))
+    }
+
     try {
-      const response = await fetch(`${API_BASE_URL}/ask-question/${documentId}`, {
+      const response = await fetch(`${API_BASE_URL}/ask-question-stream/${documentId}`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -116,20 +142,45 @@ function App() {
         throw new Error(errorData.detail || "Failed to get answer.")
       }
 
-      const data = await response.json()
       setConversation((prev) => [
         ...prev,
-        {
-          type: "ai",
-          text: data.answer,
-          id: messageId + 1,
-          sources: data.source_documents || [],
-          feedbackGiven: false
-        },
+        { type: "ai", text: "", id: aiMessageId, sources: [], feedbackGiven: false, streaming: true },
       ])
+      setLoading(false)
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split("\n\n")
+        buffer = events.pop()
+        for (const rawEvent of events) {
+          const eventLine = rawEvent.split("\n").find((line) => line.startsWith("event: "))
+          const dataLine = rawEvent.split("\n").find((line) => line.startsWith("data: "))
+          if (!eventLine || !dataLine) continue
+          const eventType = eventLine.slice("event: ".length)
+          const data = JSON.parse(dataLine.slice("data: ".length))
+          if (eventType === "sources") {
+            updateAiMessage(() => ({ sources: data.sources || [] }))
+          } else if (eventType === "token") {
+            updateAiMessage((msg) => ({ text: msg.text + data.token }))
+          } else if (eventType === "done") {
+            updateAiMessage(() => ({ text: data.answer, streaming: false }))
+          } else if (eventType === "error") {
+            throw new Error(data.detail || "Failed to get answer.")
+          }
+        }
+      }
+      updateAiMessage(() => ({ streaming: false }))
     } catch (err) {
       setError(`Question Error: ${err.message}`)
-      setConversation((prev) => [...prev, { type: "ai", text: `Error: ${err.message}`, id: Date.now() }])
+      setConversation((prev) => [
+        ...prev.filter((msg) => msg.id !== aiMessageId),
+        { type: "ai", text: `Error: ${err.message}`, id: Date.now() },
+      ])
     } finally {
       setLoading(false)
     }
@@ -226,12 +277,16 @@ function App() {
         body: formData,
       });
       const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.detail || "File upload failed.");
+      }
+      if (data.job_id) {
+        await waitForJob(data.job_id);
+      }
       setDocumentId(data.id);
       setDocumentName(data.filename);
-      setUploadMessage(data.message || "PDF uploaded and processed!");
-      if (data.message) {
-        setTimeout(() => setUploadMessage(""), 3000);
-      }
+      setUploadMessage("PDF uploaded and processed!");
+      setTimeout(() => setUploadMessage(""), 3000);
     } catch (err) {
       setError(`Upload Error: ${err.message}`);
       setDocumentId(null);
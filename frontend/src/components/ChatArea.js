@@ -29,13 +29,16 @@ export default function ChatArea({ conversation, loading, error, uploadMessage,
             {msg.type === "user" ? "S" : "ai"}
           </div>
           <div className="flex-1 lg:max-w-3xl bg-gray-50 rounded-2xl rounded-tl-sm px-4 lg:px-6 py-3 lg:py-4">
-            <p className="text-gray-800 text-sm lg:text-base leading-relaxed">{msg.text}</p>
+            <p className="text-gray-800 text-sm lg:text-base leading-relaxed whitespace-pre-wrap">
+              {msg.text}
+              {msg.streaming && <span className="inline-block w-2 h-4 ml-0.5 align-middle bg-gray-400 animate-pulse" />}
+            </p>
             {msg.type === "ai" && msg.sources && msg.sources.length > 0 && (
               <div className="mt-2 text-xs text-gray-600 border-t border-gray-200 pt-2">
                 Source(s): Page(s) {getUniquePageNumbers(msg.sources).join(', ')}
               </div>
             )}
-            {msg.type === "ai" && (
+            {msg.type === "ai" && !msg.streaming && (
               <div className="mt-3 flex space-x-2 justify-end">
                 <button
                   onClick={() => handleCopy(msg.text, msg.id)}